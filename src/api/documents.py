@@ -1,18 +1,18 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks, Query, UploadFile, File
 from pydantic import BaseModel
-from typing import List
+from typing import List, Tuple
+import asyncio
 import logging
-import tempfile
-import os
 
+from core.responses import ModeloResponse
 from services.document_extraction_service import document_extraction_service
-from services.vectorstore_service import VectorStoreService
+from services.vectorstore_service import vectorstore_service
+from services.semantic_cache import semantic_query_cache
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
-
 class ProcessDocumentsRequest(BaseModel):
     salvar_json: bool = True
     incluir_vetados: bool = True
@@ -26,6 +26,21 @@ class ProcessDocumentsResponse(BaseModel):
     artigos_vetados: int = 0
 
 
+async def _ler_uploads(files: List[UploadFile]) -> List[Tuple[str, bytes]]:
+    """Valida os PDFs enviados e retorna pares (nome, bytes) para extração em memória"""
+    for file in files:
+        if not file.filename.lower().endswith('.pdf'):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Arquivo {file.filename} não é um PDF"
+            )
+    
+    # O Starlette já gravou os uploads (spool) antes do handler; a extração é em
+    # memória, então todos os bytes ficam carregados até o fim do processamento
+    conteudos = await asyncio.gather(*(file.read() for file in files))
+    return [(file.filename, conteudo) for file, conteudo in zip(files, conteudos)]
+
+
 @router.post("/process", response_model=ProcessDocumentsResponse)
 async def processar_documentos(
     files: List[UploadFile] = File(..., description="Arquivos PDF para processar"),
@@ -34,42 +49,29 @@ async def processar_documentos(
 ):
     """Processa arquivos PDF enviados e indexa no vector store"""
     try:
-        # Cria diretório temporário
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Salva arquivos enviados
-            for file in files:
-                if not file.filename.lower().endswith('.pdf'):
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Arquivo {file.filename} não é um PDF"
-                    )
-                
-                file_path = os.path.join(temp_dir, file.filename)
-                with open(file_path, "wb") as f:
-                    content = await file.read()
-                    f.write(content)
-            
-            # Processa os arquivos
-            resultado = await document_extraction_service.processar_e_indexar(
-                caminho_pasta=temp_dir,
-                salvar_json=salvar_json,
-                incluir_vetados=incluir_vetados
+        arquivos = await _ler_uploads(files)
+        
+        # Processa os arquivos direto da memória
+        resultado = await document_extraction_service.processar_e_indexar(
+            salvar_json=salvar_json,
+            incluir_vetados=incluir_vetados,
+            arquivos=arquivos
+        )
+        
+        if resultado["sucesso"]:
+            return ModeloResponse(ProcessDocumentsResponse.model_construct(
+                message="Documentos processados e indexados com sucesso",
+                success=True,
+                total_artigos=resultado["total_artigos"],
+                artigos_em_vigor=resultado["artigos_em_vigor"],
+                artigos_vetados=resultado["artigos_vetados"]
+            ))
+        else:
+            raise HTTPException(
+                status_code=500,
+                detail="Falha ao processar documentos"
             )
-            
-            if resultado["sucesso"]:
-                return ProcessDocumentsResponse(
-                    message="Documentos processados e indexados com sucesso",
-                    success=True,
-                    total_artigos=resultado["total_artigos"],
-                    artigos_em_vigor=resultado["artigos_em_vigor"],
-                    artigos_vetados=resultado["artigos_vetados"]
-                )
-            else:
-                raise HTTPException(
-                    status_code=500,
-                    detail="Falha ao processar documentos"
-                )
-            
+        
     except HTTPException:
         raise
     except Exception as e:
@@ -88,36 +90,17 @@ async def processar_documentos_background(
     incluir_vetados: bool = True
 ):
     """Processa documentos em background"""
-    # Salva arquivos em diretório temporário
-    temp_dir = tempfile.mkdtemp()
+    # Lê os uploads antes da resposta; os arquivos são fechados ao fim da requisição
+    arquivos = await _ler_uploads(files)
     
-    try:
-        for file in files:
-            if not file.filename.lower().endswith('.pdf'):
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Arquivo {file.filename} não é um PDF"
-                )
-            
-            file_path = os.path.join(temp_dir, file.filename)
-            with open(file_path, "wb") as f:
-                content = await file.read()
-                f.write(content)
-        
-        background_tasks.add_task(
-            document_extraction_service.processar_e_indexar,
-            temp_dir,
-            salvar_json,
-            incluir_vetados
-        )
-        
-        return {"message": "Processamento iniciado em background"}
-        
-    except Exception as e:
-        # Limpa diretório em caso de erro
-        import shutil
-        shutil.rmtree(temp_dir, ignore_errors=True)
-        raise
+    background_tasks.add_task(
+        document_extraction_service.processar_e_indexar,
+        salvar_json=salvar_json,
+        incluir_vetados=incluir_vetados,
+        arquivos=arquivos
+    )
+    
+    return {"message": "Processamento iniciado em background"}
 
 
 @router.get("/buscar")
@@ -127,17 +110,20 @@ async def buscar_documentos(
 ):
     """Busca semântica na base de conhecimento"""
     try:
-        service = VectorStoreService()
-        docs = await service.buscar_similares(query, k=limite)
+        # Mesma query (normalizada): responde sem gerar embedding
+        resultados = semantic_query_cache.buscar_texto(query, limite)
         
-        resultados = []
-        for doc in docs:
-            resultados.append({
-                "titulo": doc.metadata.get("titulo", ""),
-                "tipo": doc.metadata.get("tipo", ""),
-                "fonte": doc.metadata.get("fonte", ""),
-                "trecho": doc.page_content[:500] + "..." if len(doc.page_content) > 500 else doc.page_content
-            })
+        if resultados is None:
+            vetor = await vectorstore_service.gerar_embedding(query)
+            
+            # Queries semanticamente equivalentes reaproveitam o resultado
+            resultados = semantic_query_cache.buscar(vetor, limite)
+            
+            if resultados is None:
+                resultados = await vectorstore_service.buscar_trechos(vetor, k=limite, max_chars=500)
+                # Lista vazia também é o retorno de falha na busca: não vai para o cache
+                if resultados:
+                    semantic_query_cache.guardar(vetor, limite, resultados, texto=query)
         
         return {
             "query": query,
@@ -157,13 +143,13 @@ async def buscar_documentos(
 async def estatisticas():
     """Estatísticas da base de conhecimento"""
     try:
-        service = VectorStoreService()
-        total = await service.contar_documentos()
+        total = await vectorstore_service.contar_documentos_cache()
+        conectado = await vectorstore_service.verificar_conexao_cache()
         
         return {
             "total_documentos": total,
-            "indice": service._index_name,
-            "status": "ativo" if await service.verificar_conexao() else "offline"
+            "indice": vectorstore_service._index_name,
+            "status": "ativo" if conectado else "offline"
         }
         
     except Exception as e:
@@ -2,12 +2,13 @@ from fastapi import APIRouter, HTTPException, status, Form
 from typing import Optional
 import logging
 
+from core.responses import ModeloResponse
 from models.schemas import (
     CriarPerguntasResponse,
-    DificuldadeEnum,
-    TipoQuestaoEnum
+    Dificuldade,
+    TipoQuestao
 )
-from services.perguntas_service import PerguntasService
+from services.perguntas_service import perguntas_service
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/perguntas", tags=["Perguntas"])
@@ -22,8 +23,8 @@ router = APIRouter(prefix="/perguntas", tags=["Perguntas"])
 async def criar_perguntas(
     tema: str = Form(..., description="Tema jurídico para gerar questões"),
     quantidade: int = Form(default=5, ge=1, le=20, description="Quantidade de questões"),
-    dificuldade: DificuldadeEnum = Form(default=DificuldadeEnum.MEDIO, description="Nível de dificuldade"),
-    tipo: TipoQuestaoEnum = Form(default=TipoQuestaoEnum.MULTIPLA_ESCOLHA, description="Formato da questão")
+    dificuldade: Dificuldade = Form(default="medio", description="Nível de dificuldade"),
+    tipo: TipoQuestao = Form(default="multipla_escolha", description="Formato da questão")
 ):
     """
     Gera questões para estudo de concursos públicos.
@@ -48,8 +49,7 @@ async def criar_perguntas(
             tipo=tipo
         )
         
-        service = PerguntasService()
-        resultado = await service.criar_perguntas(request)
+        resultado = await perguntas_service.criar_perguntas(request)
         
         if not resultado.sucesso:
             raise HTTPException(
@@ -57,7 +57,7 @@ async def criar_perguntas(
                 detail="Falha ao gerar questões. Verifique os logs."
             )
         
-        return resultado
+        return ModeloResponse(resultado)
         
     except HTTPException:
         raise
@@ -66,4 +66,4 @@ async def criar_perguntas(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
-        )
\ No newline at end of file
+        )
\ No newline at end of file
@@ -1,11 +1,13 @@
 from fastapi import APIRouter, HTTPException, status
 import logging
 
+from core.responses import ModeloResponse
 from models.schemas import (
+    REQUEST_CONFIG,
     ResponderPerguntaRequest,
     ResponderPerguntaResponse
 )
-from services.perguntas_service import PerguntasService
+from services.perguntas_service import perguntas_service
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/responder", tags=["Responder Questões"])
@@ -48,8 +50,7 @@ async def responder_pergunta(request: ResponderPerguntaRequest):
     ```
     """
     try:
-        service = PerguntasService()
-        resultado = await service.responder_pergunta(request)
+        resultado = await perguntas_service.responder_pergunta(request)
         
         if not resultado.sucesso:
             raise HTTPException(
@@ -57,7 +58,7 @@ async def responder_pergunta(request: ResponderPerguntaRequest):
                 detail="Falha ao processar resposta"
             )
         
-        return resultado
+        return ModeloResponse(resultado)
         
     except HTTPException:
         raise
@@ -69,7 +70,7 @@ async def responder_pergunta(request: ResponderPerguntaRequest):
         )
 
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional
 
 class ValidarRespostaRequest(BaseModel):
@@ -78,8 +79,9 @@ class ValidarRespostaRequest(BaseModel):
     contexto_adicional: Optional[str] = Field(default=None, description="Contexto extra")
     resposta_usuario: str = Field(..., description="Resposta escolhida pelo usuário")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        **REQUEST_CONFIG,
+        json_schema_extra={
             "example": {
                 "pergunta": "De acordo com a CF/88, são direitos sociais, EXCETO:",
                 "alternativas": [
@@ -92,6 +94,7 @@ class ValidarRespostaRequest(BaseModel):
                 "resposta_usuario": "C"
             }
         }
+    )
 
 
 @router.post(
@@ -117,8 +120,7 @@ async def validar_resposta(request: ValidarRespostaRequest):
             contexto_adicional=request.contexto_adicional
         )
         
-        service = PerguntasService()
-        resultado = await service.responder_pergunta(pergunta_request)
+        resultado = await perguntas_service.responder_pergunta(pergunta_request)
         
         resposta_correta = resultado.resposta_correta.upper().strip()
         resposta_user = request.resposta_usuario.upper().strip()
@@ -139,4 +141,4 @@ async def validar_resposta(request: ValidarRespostaRequest):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
-        )
\ No newline at end of file
+        )
\ No newline at end of file
@@ -1 +1,9 @@
-from .config import settings
\ No newline at end of file
+from typing import Any
+
+from .config import get_settings
+
+
+def __getattr__(nome: str) -> Any:
+    if nome == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
@@ -1,22 +1,103 @@
-from pydantic_settings import BaseSettings
-from pydantic import Field
-from typing import List, Dict, Any
-import json
-import yaml
+from dataclasses import dataclass, field, fields
+from typing import List, Dict, Any, Optional, Tuple
+from functools import lru_cache
 import os
+import tomllib
+import orjson
+from dotenv import dotenv_values
 from pathlib import Path
 
 
+# Arquivos de configuração aceitos, em ordem de preferência
+CONFIG_ARQUIVOS = ("config.toml", "config.yaml")
+
+
+def _parse_yaml(caminho: str) -> Dict[str, Any]:
+    # PyYAML só é importado quando não há config.toml
+    import yaml
+    try:
+        # Loader em C (LibYAML), bem mais rápido que o SafeLoader em Python puro
+        from yaml import CSafeLoader as YamlLoader
+    except ImportError:
+        from yaml import SafeLoader as YamlLoader
+    
+    with open(caminho, "r", encoding="utf-8") as f:
+        return yaml.load(f, Loader=YamlLoader) or {}
+
+
+@lru_cache(maxsize=1)
+def _carregar_config(caminho: str, mtime_ns: int) -> Dict[str, Any]:
+    """Lê e parseia o arquivo; o mtime na chave invalida o cache quando o arquivo muda"""
+    if caminho.endswith(".toml"):
+        with open(caminho, "rb") as f:
+            return tomllib.load(f)
+    return _parse_yaml(caminho)
+
+
+def _mtime_config(config_path: Path) -> Optional[int]:
+    try:
+        return config_path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
 def load_yaml_config() -> Dict[str, Any]:
-    """Carrega configurações do arquivo YAML"""
-    config_path = Path("config.yaml")
-    if config_path.exists():
-        with open(config_path, "r", encoding="utf-8") as f:
-            return yaml.safe_load(f)
+    """
+    Carrega o arquivo de configuração: config.toml (tomllib, stdlib) se
+    existir, senão config.yaml. O parse fica em cache enquanto o arquivo
+    não mudar; ambos produzem o mesmo dicionário aninhado.
+    """
+    for caminho in CONFIG_ARQUIVOS:
+        mtime = _mtime_config(Path(caminho))
+        if mtime is not None:
+            return _carregar_config(caminho, mtime)
     return {}
 
 
-class Settings(BaseSettings):
+# Sentinela para chave ausente no YAML
+_MISSING = object()
+
+# Caminho no YAML (notação de ponto) -> campo do Settings
+_YAML_PATHS = {
+    "app.name": "APP_NAME",
+    "app.version": "APP_VERSION",
+    "app.env": "APP_ENV",
+    "app.debug": "DEBUG",
+    "app.host": "HOST",
+    "app.port": "PORT",
+    "app.workers": "WORKERS",
+    "ollama.base_url": "OLLAMA_BASE_URL",
+    "ollama.model": "OLLAMA_MODEL",
+    "ollama.embedding_model": "OLLAMA_EMBEDDING_MODEL",
+    "embeddings.backend": "EMBEDDINGS_BACKEND",
+    "embeddings.infinity_base_url": "INFINITY_BASE_URL",
+    "embeddings.infinity_model": "INFINITY_EMBEDDING_MODEL",
+    "opensearch.host": "OPENSEARCH_HOST",
+    "opensearch.port": "OPENSEARCH_PORT",
+    "opensearch.user": "OPENSEARCH_USER",
+    "opensearch.password": "OPENSEARCH_PASSWORD",
+    "opensearch.index": "OPENSEARCH_INDEX",
+    "opensearch.use_ssl": "OPENSEARCH_USE_SSL",
+    "rag.top_k": "RAG_TOP_K",
+    "rag.score_threshold": "RAG_SCORE_THRESHOLD",
+    "knn.m": "KNN_M",
+    "knn.ef_construction": "KNN_EF_CONSTRUCTION",
+    "knn.ef_search": "KNN_EF_SEARCH",
+    "knn.quantizacao": "KNN_QUANTIZACAO",
+    "cache.semantic_path": "SEMANTIC_CACHE_PATH",
+    "cache.semantic_answer_threshold": "SEMANTIC_ANSWER_THRESHOLD",
+    "cache.embedding_path": "EMBEDDING_CACHE_PATH",
+    "cors.origins": "CORS_ORIGINS"
+}
+
+# Caminhos separados uma única vez, na importação do módulo
+_YAML_MAPPING: Tuple[Tuple[Tuple[str, ...], str], ...] = tuple(
+    (tuple(caminho.split(".")), campo) for caminho, campo in _YAML_PATHS.items()
+)
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
     # App
     APP_NAME: str = "Gerador de Questões"
     APP_VERSION: str = "1.0.0"
@@ -24,12 +105,22 @@ class Settings(BaseSettings):
     DEBUG: bool = True
     HOST: str = "0.0.0.0"
     PORT: int = 8000
+    # Processos do uvicorn fora do modo debug. Caches em memória (semântico,
+    # embeddings) e sua invalidação após /process são por processo: com mais
+    # de um worker, cada um tem sua cópia e os snapshots em disco são desligados
+    WORKERS: int = 1
     
     # Ollama
     OLLAMA_BASE_URL: str = "http://localhost:11434"
     OLLAMA_MODEL: str = "llama3.2:3b"
     OLLAMA_EMBEDDING_MODEL: str = "bge-m3:latest"
     
+    # Embeddings: "ollama" ou "infinity" (servidor Infinity/TEI com lotes dinâmicos).
+    # INFINITY_BASE_URL inclui o prefixo de versão da rota /embeddings (TEI: .../v1)
+    EMBEDDINGS_BACKEND: str = "ollama"
+    INFINITY_BASE_URL: str = "http://localhost:7997"
+    INFINITY_EMBEDDING_MODEL: str = "BAAI/bge-m3"
+    
     # OpenSearch
     OPENSEARCH_HOST: str = "localhost"
     OPENSEARCH_PORT: int = 9200
@@ -42,75 +133,111 @@ class Settings(BaseSettings):
     RAG_TOP_K: int = 5
     RAG_SCORE_THRESHOLD: float = 0.5
     
+    # HNSW (perfil de latência; aumente ef_search/ef_construction para mais recall)
+    KNN_M: int = 16
+    KNN_EF_CONSTRUCTION: int = 100
+    KNN_EF_SEARCH: int = 100
+    # Quantização escalar (int7) dos vetores no grafo HNSW (Lucene, OpenSearch >= 2.16)
+    KNN_QUANTIZACAO: bool = True
+    
+    # Cache
+    SEMANTIC_CACHE_PATH: str = ""
+    SEMANTIC_ANSWER_THRESHOLD: float = 0.95
+    EMBEDDING_CACHE_PATH: str = ""
+    
     # CORS
-    CORS_ORIGINS: List[str] = ["http://localhost:3000"]
-    
-    def __init__(self, **kwargs):
-        # Carrega configurações do YAML primeiro
-        yaml_config = load_yaml_config()
-        
-        # Mapeia configurações do YAML para variáveis de ambiente
-        if yaml_config:
-            self._map_yaml_to_env(yaml_config)
-        
-        super().__init__(**kwargs)
-    
-    def _map_yaml_to_env(self, config: Dict[str, Any]):
-        """Mapeia configurações do YAML para o formato esperado"""
-        mapping = {
-            "app.name": "APP_NAME",
-            "app.version": "APP_VERSION", 
-            "app.env": "APP_ENV",
-            "app.debug": "DEBUG",
-            "app.host": "HOST",
-            "app.port": "PORT",
-            "ollama.base_url": "OLLAMA_BASE_URL",
-            "ollama.model": "OLLAMA_MODEL",
-            "ollama.embedding_model": "OLLAMA_EMBEDDING_MODEL",
-            "opensearch.host": "OPENSEARCH_HOST",
-            "opensearch.port": "OPENSEARCH_PORT",
-            "opensearch.user": "OPENSEARCH_USER",
-            "opensearch.password": "OPENSEARCH_PASSWORD",
-            "opensearch.index": "OPENSEARCH_INDEX",
-            "opensearch.use_ssl": "OPENSEARCH_USE_SSL",
-            "rag.top_k": "RAG_TOP_K",
-            "rag.score_threshold": "RAG_SCORE_THRESHOLD",
-            "cors.origins": "CORS_ORIGINS"
-        }
-        
-        for yaml_path, env_var in mapping.items():
-            value = self._get_nested_value(config, yaml_path)
-            if value is not None:
-                if env_var == "CORS_ORIGINS" and isinstance(value, list):
-                    os.environ[env_var] = json.dumps(value)
-                else:
-                    os.environ[env_var] = str(value)
-    
-    def _get_nested_value(self, data: Dict[str, Any], path: str) -> Any:
-        """Obtém valor aninhado usando notação de ponto"""
-        keys = path.split(".")
-        current = data
-        for key in keys:
-            if isinstance(current, dict) and key in current:
-                current = current[key]
-            else:
-                return None
-        return current
+    CORS_ORIGINS: List[str] = field(default_factory=lambda: ["http://localhost:3000"])
     
     @property
     def opensearch_url(self) -> str:
         protocol = "https" if self.OPENSEARCH_USE_SSL else "http"
         return f"{protocol}://{self.OPENSEARCH_HOST}:{self.OPENSEARCH_PORT}"
     
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
-        
-        @classmethod
-        def parse_env_var(cls, field_name: str, raw_val: str):
-            if field_name == "CORS_ORIGINS":
-                return json.loads(raw_val)
-            return raw_val
+    @property
+    def persistir_caches(self) -> bool:
+        """Snapshots de cache em disco só com um processo (senão o último a encerrar sobrescreve)"""
+        return self.DEBUG or self.WORKERS <= 1
+
+
+# Tipo de cada campo, para converter valores vindos de env/.env/YAML
+_TIPOS_CAMPOS: Dict[str, Any] = {f.name: f.type for f in fields(Settings)}
+
+_VERDADEIROS = frozenset({"1", "true", "t", "yes", "y", "on"})
+_FALSOS = frozenset({"0", "false", "f", "no", "n", "off", ""})
+
+
+def _converter(campo: str, valor: Any) -> Any:
+    """Converte o valor bruto para o tipo declarado do campo"""
+    tipo = _TIPOS_CAMPOS[campo]
+    
+    if tipo is bool:
+        if isinstance(valor, str):
+            texto = valor.strip().lower()
+            if texto in _VERDADEIROS:
+                return True
+            if texto in _FALSOS:
+                return False
+            raise ValueError(f"Valor booleano inválido para {campo}: {valor!r}")
+        return bool(valor)
+    
+    if tipo in (int, float, str):
+        return tipo(valor)
+    
+    # List[str]: aceita lista (YAML) ou string JSON (env)
+    if isinstance(valor, str):
+        valor = orjson.loads(valor)
+    return [str(v) for v in valor]
+
+
+def _get_nested_value(data: Dict[str, Any], keys: Tuple[str, ...]) -> Any:
+    """Obtém valor aninhado a partir do caminho já separado em chaves"""
+    current = data
+    for key in keys:
+        current = current.get(key, _MISSING) if isinstance(current, dict) else _MISSING
+        if current is _MISSING:
+            return None
+    return current
+
+
+def _map_yaml_to_kwargs(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Mapeia configurações do YAML para os campos do Settings"""
+    yaml_kwargs = {}
+    for chaves, campo in _YAML_MAPPING:
+        value = _get_nested_value(config, chaves)
+        if value is not None:
+            yaml_kwargs[campo] = value
+    return yaml_kwargs
+
+
+def load_settings(**kwargs) -> Settings:
+    """
+    Monta o Settings combinando, da menor para a maior precedência:
+    valores padrão, arquivo .env, variáveis de ambiente, config.yaml e kwargs.
+    """
+    brutos: Dict[str, Any] = {}
+    
+    # Nomes sem distinção de maiúsculas (como no pydantic-settings): ollama_base_url == OLLAMA_BASE_URL
+    env_file = {k.upper(): v for k, v in dotenv_values(".env").items() if v is not None}
+    ambiente = {k.upper(): v for k, v in os.environ.items()}
+    for fonte in (env_file, ambiente):
+        for campo in _TIPOS_CAMPOS:
+            if campo in fonte:
+                brutos[campo] = fonte[campo]
+    
+    brutos.update(_map_yaml_to_kwargs(load_yaml_config()))
+    brutos.update(kwargs)
+    
+    return Settings(**{campo: _converter(campo, valor) for campo, valor in brutos.items()})
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Retorna a instância única de Settings, construída no primeiro acesso"""
+    return load_settings()
 
 
-settings = Settings()
\ No newline at end of file
+def __getattr__(nome: str) -> Any:
+    # Compatibilidade: `from core.config import settings` continua funcionando
+    if nome == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
\ No newline at end of file
@@ -0,0 +1,26 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+
+class ORJSONResponse(JSONResponse):
+    """Resposta JSON serializada com orjson (C/Rust, gera bytes diretamente)"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ModeloResponse(Response):
+    """
+    Resposta para um modelo Pydantic já construído pelo serviço.
+
+    Retornar uma Response faz o FastAPI pular a revalidação contra o
+    response_model; o modelo é serializado direto pelo pydantic-core.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: BaseModel) -> bytes:
+        return content.model_dump_json().encode("utf-8")
@@ -1,15 +1,26 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from contextlib import asynccontextmanager
+from typing import Optional, Tuple
+import asyncio
 import logging
+import sys
+import time
 import uvicorn
 
 from api.perguntas import router as rotas_perguntas
 from api.responder import router as rotas_responder
 from api.documents import router as rotas_documents
-from core.config import settings
-from services.llm_service import verificar_ollama
-from services.vectorstore_service import VectorStoreService
+from core.config import get_settings
+from core.responses import ORJSONResponse
+from services.llm_service import verificar_ollama, fechar_cliente_http, fechar_embeddings
+from services.vectorstore_service import vectorstore_service
+from services.perguntas_service import perguntas_service
+from services.semantic_cache import semantic_query_cache
+from services.document_extraction_service import encerrar_executor
+
+settings = get_settings()
 
 # Configuração de logging
 logging.basicConfig(
@@ -19,30 +30,50 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+async def _inicializar_indice():
+    """Cria o índice se necessário e registra a contagem de documentos"""
+    try:
+        await vectorstore_service.criar_indice()
+        total_docs = await vectorstore_service.contar_documentos()
+        logger.info(f"📚 Documentos indexados: {total_docs}")
+    except Exception as e:
+        logger.error(f"❌ Erro ao conectar OpenSearch: {e}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Gerencia o ciclo de vida da aplicação"""
     logger.info("🚀 Iniciando aplicação com LangChain...")
     
-    # Verifica Ollama
-    ollama_status = await verificar_ollama()
-    if ollama_status["disponivel"]:
+    # Verifica Ollama e OpenSearch em paralelo
+    ollama_status, opensearch_ok = await asyncio.gather(
+        verificar_ollama(),
+        vectorstore_service.verificar_conexao(),
+        return_exceptions=True
+    )
+    
+    tarefas = []
+    if isinstance(ollama_status, dict) and ollama_status["disponivel"]:
         logger.info(f"✅ Ollama conectado - Modelos: {ollama_status['modelos']}")
+        # Evita que a primeira requisição pague o carregamento do bge-m3
+        tarefas.append(vectorstore_service.aquecer())
     else:
         logger.warning("⚠️ Ollama não disponível - Verifique se está rodando")
     
-    # Verifica e inicializa OpenSearch
-    try:
-        vectorstore = VectorStoreService()
-        if await vectorstore.verificar_conexao():
-            logger.info("✅ OpenSearch conectado")
-            await vectorstore.criar_indice()
-            total_docs = await vectorstore.contar_documentos()
-            logger.info(f"📚 Documentos indexados: {total_docs}")
-        else:
-            logger.warning("⚠️ OpenSearch não disponível")
-    except Exception as e:
-        logger.error(f"❌ Erro ao conectar OpenSearch: {e}")
+    if isinstance(opensearch_ok, Exception):
+        logger.error(f"❌ Erro ao conectar OpenSearch: {opensearch_ok}")
+    elif opensearch_ok:
+        logger.info("✅ OpenSearch conectado")
+        tarefas.append(_inicializar_indice())
+    else:
+        logger.warning("⚠️ OpenSearch não disponível")
+    
+    # Aquecimento e criação do índice também são independentes
+    await asyncio.gather(*tarefas)
+    
+    # Serviços já construídos ficam acessíveis também via app.state
+    app.state.vectorstore_service = vectorstore_service
+    app.state.perguntas_service = perguntas_service
     
     logger.info("=" * 50)
     logger.info(f"📖 Documentação: http://{settings.HOST}:{settings.PORT}/docs")
@@ -51,6 +82,12 @@ async def lifespan(app: FastAPI):
     yield
     
     logger.info("👋 Encerrando aplicação...")
+    await perguntas_service.aguardar_gravacoes()
+    semantic_query_cache.salvar()
+    vectorstore_service.salvar_cache_embeddings()
+    encerrar_executor()
+    await fechar_cliente_http()
+    await fechar_embeddings()
 
 
 # Criação da aplicação
@@ -73,6 +110,7 @@ Esta API utiliza **LangChain** com **RAG** (Retrieval-Augmented Generation) para
 - ⚡ FastAPI para a API REST
     """,
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     docs_url="/docs",
     redoc_url="/redoc"
 )
@@ -91,6 +129,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compressão de respostas grandes (ex.: trechos de /documents/buscar)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 
 @app.get("/", tags=["Root"])
 async def root():
@@ -112,21 +153,48 @@ async def root():
     }
 
 
+async def _verificar_opensearch():
+    """Retorna (conectado, total de documentos) do OpenSearch"""
+    try:
+        opensearch_ok = await vectorstore_service.verificar_conexao()
+        docs_count = await vectorstore_service.contar_documentos() if opensearch_ok else 0
+    except:
+        opensearch_ok = False
+        docs_count = 0
+    return opensearch_ok, docs_count
+
+
+# Resultado do /health reaproveitado por alguns segundos (polling de load balancer)
+HEALTH_TTL = 2.0
+_health_cache: Optional[Tuple[float, dict]] = None
+_health_lock = asyncio.Lock()
+
+
 @app.get("/health", tags=["Health Check"])
 async def health_check():
     """Verifica saúde de todos os serviços"""
+    global _health_cache
     
-    # Verifica Ollama
-    ollama_status = await verificar_ollama()
+    if _health_cache and time.monotonic() - _health_cache[0] < HEALTH_TTL:
+        return _health_cache[1]
     
-    # Verifica OpenSearch
-    try:
-        vectorstore = VectorStoreService()
-        opensearch_ok = await vectorstore.verificar_conexao()
-        docs_count = await vectorstore.contar_documentos() if opensearch_ok else 0
-    except:
-        opensearch_ok = False
-        docs_count = 0
+    # Requisições simultâneas esperam uma única verificação
+    async with _health_lock:
+        if _health_cache and time.monotonic() - _health_cache[0] < HEALTH_TTL:
+            return _health_cache[1]
+        
+        resultado = await _verificar_servicos()
+        _health_cache = (time.monotonic(), resultado)
+        return resultado
+
+
+async def _verificar_servicos() -> dict:
+    """Consulta Ollama e OpenSearch e monta o status de saúde"""
+    # Verifica Ollama e OpenSearch em paralelo
+    ollama_status, (opensearch_ok, docs_count) = await asyncio.gather(
+        verificar_ollama(),
+        _verificar_opensearch()
+    )
     
     todos_ok = ollama_status["disponivel"] and opensearch_ok
     
@@ -153,5 +221,10 @@ if __name__ == "__main__":
         host=settings.HOST,
         port=settings.PORT,
         reload=settings.DEBUG,
+        # Event loop e parser HTTP em C (uvloop não existe no Windows)
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        # Reload exige processo único; caches e invalidação são por processo (ver WORKERS)
+        workers=None if settings.DEBUG else settings.WORKERS,
         log_level="debug" if settings.DEBUG else "info"
     )
\ No newline at end of file
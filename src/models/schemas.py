@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional, Literal
 from enum import Enum
 
@@ -14,9 +14,23 @@ class TipoQuestaoEnum(str, Enum):
     MULTIPLA_ESCOLHA = "multipla_escolha"
 
 
+# Tipos usados nos requests: strings validadas, sem construir membros de Enum
+Dificuldade = Literal["facil", "medio", "dificil"]
+TipoQuestao = Literal["multipla_escolha"]
+
+
+# ============ CONFIGURAÇÃO ============
+# DTOs imutáveis: seguros para compartilhar entre caches e requisições
+DTO_CONFIG = ConfigDict(frozen=True)
+# Requests também descartam espaços nas bordas das strings
+REQUEST_CONFIG = ConfigDict(frozen=True, str_strip_whitespace=True)
+
+
 # ============ SCHEMAS PARA OUTPUT PARSER ============
 class Alternativa(BaseModel):
     """Schema para alternativa de questão"""
+    model_config = DTO_CONFIG
+    
     letra: str = Field(description="Letra da alternativa (A, B, C, D, E)")
     texto: str = Field(description="Texto da alternativa")
     correta: bool = Field(default=False, description="Se é a alternativa correta")
@@ -24,6 +38,8 @@ class Alternativa(BaseModel):
 
 class QuestaoGerada(BaseModel):
     """Schema para questão gerada pelo LLM"""
+    model_config = DTO_CONFIG
+    
     numero: int = Field(description="Número da questão")
     enunciado: str = Field(description="Texto do enunciado da questão")
     alternativas: Optional[List[Alternativa]] = Field(
@@ -56,11 +72,12 @@ class RespostaOutput(BaseModel):
 class CriarPerguntasRequest(BaseModel):
     tema: str = Field(..., description="Tema jurídico para gerar questões", min_length=3)
     quantidade: int = Field(default=5, ge=1, le=20, description="Quantidade de questões")
-    dificuldade: DificuldadeEnum = Field(default=DificuldadeEnum.MEDIO)
-    tipo: TipoQuestaoEnum = Field(default=TipoQuestaoEnum.MULTIPLA_ESCOLHA)
+    dificuldade: Dificuldade = Field(default="medio")
+    tipo: TipoQuestao = Field(default="multipla_escolha")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        **REQUEST_CONFIG,
+        json_schema_extra={
             "example": {
                 "tema": "Direito Constitucional - Direitos Fundamentais",
                 "quantidade": 5,
@@ -68,6 +85,7 @@ class CriarPerguntasRequest(BaseModel):
                 "tipo": "multipla_escolha"
             }
         }
+    )
 
 
 class ResponderPerguntaRequest(BaseModel):
@@ -75,8 +93,9 @@ class ResponderPerguntaRequest(BaseModel):
     alternativas: Optional[List[str]] = Field(default=None, description="Alternativas se houver")
     contexto_adicional: Optional[str] = Field(default=None, description="Contexto extra")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        **REQUEST_CONFIG,
+        json_schema_extra={
             "example": {
                 "pergunta": "De acordo com a CF/88, são direitos sociais, EXCETO:",
                 "alternativas": [
@@ -88,10 +107,13 @@ class ResponderPerguntaRequest(BaseModel):
                 ]
             }
         }
+    )
 
 
 # ============ RESPONSES ============
 class CriarPerguntasResponse(BaseModel):
+    model_config = DTO_CONFIG
+    
     sucesso: bool
     tema: str
     quantidade_gerada: int
@@ -100,6 +122,8 @@ class CriarPerguntasResponse(BaseModel):
 
 
 class ResponderPerguntaResponse(BaseModel):
+    model_config = DTO_CONFIG
+    
     sucesso: bool
     pergunta: str
     resposta_correta: str
@@ -116,8 +140,9 @@ class DocumentoRequest(BaseModel):
     tipo: str = Field(..., description="Tipo: lei, jurisprudencia, doutrina, sumula")
     fonte: Optional[str] = Field(default=None, description="Fonte do documento")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        **REQUEST_CONFIG,
+        json_schema_extra={
             "example": {
                 "titulo": "Constituição Federal - Art. 5º",
                 "conteudo": "Art. 5º Todos são iguais perante a lei, sem distinção de qualquer natureza...",
@@ -125,9 +150,12 @@ class DocumentoRequest(BaseModel):
                 "fonte": "CF/88"
             }
         }
+    )
 
 
 class DocumentoResponse(BaseModel):
+    model_config = DTO_CONFIG
+    
     sucesso: bool
     documento_id: str
-    mensagem: str
\ No newline at end of file
+    mensagem: str
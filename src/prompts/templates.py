@@ -1,54 +1,40 @@
+from types import MappingProxyType
+from typing import Mapping
+
 from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 
 from models.schemas import QuestoesOutput, RespostaOutput, DificuldadeEnum, TipoQuestaoEnum
 
 
-class PromptTemplates:
-    """Templates de prompts para o sistema de questões"""
-    
-    # ============ MAPEAMENTOS ============
-    NIVEIS_DIFICULDADE = {
-        DificuldadeEnum.FACIL: "básico, cobrando conceitos fundamentais e letra de lei",
-        DificuldadeEnum.MEDIO: "intermediário, exigindo interpretação e correlação de conceitos",
-        DificuldadeEnum.DIFICIL: "avançado, com pegadinhas, exceções e jurisprudência consolidada"
-    }
-    
-    FORMATOS_QUESTAO = {
-        TipoQuestaoEnum.MULTIPLA_ESCOLHA: """
+# ============ MAPEAMENTOS ============
+# Chaveados pelo valor (str) dos enums; somente leitura
+NIVEIS_DIFICULDADE: Mapping[str, str] = MappingProxyType({
+    DificuldadeEnum.FACIL.value: "básico, cobrando conceitos fundamentais e letra de lei",
+    DificuldadeEnum.MEDIO.value: "intermediário, exigindo interpretação e correlação de conceitos",
+    DificuldadeEnum.DIFICIL.value: "avançado, com pegadinhas, exceções e jurisprudência consolidada"
+})
+
+FORMATOS_QUESTAO: Mapping[str, str] = MappingProxyType({
+    TipoQuestaoEnum.MULTIPLA_ESCOLHA.value: """
 - Enunciado claro e objetivo
 - 5 alternativas (A, B, C, D, E) 
 - Apenas UMA alternativa correta
-- Distratores plausíveis nas alternativas incorretas""",
-        
-#         TipoQuestaoEnum.CERTO_ERRADO: """
-# - Uma afirmação assertiva para ser julgada
-# - Resposta: CERTO ou ERRADO
-# - A afirmação deve ser totalmente certa ou totalmente errada""",
-        
-#         TipoQuestaoEnum.DISSERTATIVA: """
-# - Pergunta aberta que exija desenvolvimento
-# - Resposta esperada com pontos principais
-# - Critérios de correção claros"""
-    }
+- Distratores plausíveis nas alternativas incorretas"""
+})
 
 
-# ============ PROMPT PARA GERAR QUESTÕES ============
-GERAR_QUESTOES_TEMPLATE = """Você é um especialista em elaboração de questões para concursos públicos brasileiros no estilo FCC, com profundo conhecimento jurídico.
-
-## CONTEXTO JURÍDICO (use como base para as questões):
-{contexto}
-
-{questoes_existentes}
+class PromptTemplates:
+    """Templates de prompts para o sistema de questões"""
+    
+    NIVEIS_DIFICULDADE = NIVEIS_DIFICULDADE
+    FORMATOS_QUESTAO = FORMATOS_QUESTAO
 
-## TAREFA:
-Elabore exatamente {quantidade} questão(ões) sobre: "{tema}"
 
-## ESPECIFICAÇÕES:
-- Nível: {nivel_dificuldade}
-- Tipo: {tipo_questao}
-- Formato esperado: {formato_questao}
-- Estilo: FCC com 5 alternativas, linguagem formal e foco em letra de lei
+# ============ PROMPT PARA GERAR QUESTÕES ============
+# Partes fixas (regras e formato de saída) vêm antes das variáveis: o prefixo
+# do prompt é idêntico entre requisições e o Ollama reaproveita seu KV cache
+GERAR_QUESTOES_TEMPLATE = """Você é um especialista em elaboração de questões para concursos públicos brasileiros no estilo FCC, com profundo conhecimento jurídico.
 
 ## REGRAS OBRIGATÓRIAS:
 1. Baseie-se PRIORITARIAMENTE no contexto jurídico fornecido
@@ -57,40 +43,46 @@ Elabore exatamente {quantidade} questão(ões) sobre: "{tema}"
 4. A justificativa deve ser didática, explicando o porquê de cada alternativa
 5. Use linguagem formal apropriada para concursos públicos
 6. Cada questão deve testar um aspecto diferente do tema
-7. **IMPORTANTE**: NÃO repita ou crie questões similares às já existentes mostradas acima
+7. **IMPORTANTE**: NÃO repita ou crie questões similares às já existentes mostradas abaixo
 8. Crie questões originais e diferentes das existentes
 9. Siga rigorosamente o estilo FCC: formal, direto, baseado em lei
 
 ## FORMATO DE SAÍDA:
 {format_instructions}
 
+## CONTEXTO JURÍDICO (use como base para as questões):
+{contexto}
+
+{questoes_existentes}
+
+## ESPECIFICAÇÕES:
+- Nível: {nivel_dificuldade}
+- Tipo: {tipo_questao}
+- Formato esperado: {formato_questao}
+- Estilo: FCC com 5 alternativas, linguagem formal e foco em letra de lei
+
+## TAREFA:
+Elabore exatamente {quantidade} questão(ões) sobre: "{tema}"
+
 Gere as {quantidade} questões agora:"""
 
 
-def get_gerar_questoes_prompt() -> ChatPromptTemplate:
-    """Retorna o prompt template para geração de questões"""
-    parser = JsonOutputParser(pydantic_object=QuestoesOutput)
-    
+def _build_gerar_questoes_prompt() -> ChatPromptTemplate:
     prompt = ChatPromptTemplate.from_messages([
         ("system", "Você é um especialista em elaboração de questões para concursos públicos brasileiros."),
         ("human", GERAR_QUESTOES_TEMPLATE)
     ])
     
-    return prompt.partial(format_instructions=parser.get_format_instructions())
-
+    return prompt.partial(format_instructions=QUESTOES_PARSER.get_format_instructions())
 
-# ============ PROMPT PARA RESPONDER QUESTÕES ============
-RESPONDER_QUESTAO_TEMPLATE = """Você é um professor especialista em preparação para concursos públicos brasileiros, conhecido por suas explicações claras e didáticas.
-
-## CONTEXTO JURÍDICO RELEVANTE:
-{contexto}
 
-## QUESTÃO A SER RESPONDIDA:
-{pergunta}
+def get_gerar_questoes_prompt() -> ChatPromptTemplate:
+    """Retorna o prompt template para geração de questões"""
+    return _GERAR_QUESTOES_PROMPT
 
-{alternativas_texto}
 
-{contexto_adicional}
+# ============ PROMPT PARA RESPONDER QUESTÕES ============
+RESPONDER_QUESTAO_TEMPLATE = """Você é um professor especialista em preparação para concursos públicos brasileiros, conhecido por suas explicações claras e didáticas.
 
 ## SUA TAREFA:
 1. Analise cuidadosamente a questão e todas as alternativas
@@ -103,19 +95,31 @@ RESPONDER_QUESTAO_TEMPLATE = """Você é um professor especialista em preparaç
 ## FORMATO DE SAÍDA:
 {format_instructions}
 
+## CONTEXTO JURÍDICO RELEVANTE:
+{contexto}
+
+## QUESTÃO A SER RESPONDIDA:
+{pergunta}
+
+{alternativas_texto}
+
+{contexto_adicional}
+
 Responda a questão:"""
 
 
-def get_responder_prompt() -> ChatPromptTemplate:
-    """Retorna o prompt template para responder questões"""
-    parser = JsonOutputParser(pydantic_object=RespostaOutput)
-    
+def _build_responder_prompt() -> ChatPromptTemplate:
     prompt = ChatPromptTemplate.from_messages([
         ("system", "Você é um professor especialista em concursos públicos, focado em explicações didáticas."),
         ("human", RESPONDER_QUESTAO_TEMPLATE)
     ])
     
-    return prompt.partial(format_instructions=parser.get_format_instructions())
+    return prompt.partial(format_instructions=RESPOSTA_PARSER.get_format_instructions())
+
+
+def get_responder_prompt() -> ChatPromptTemplate:
+    """Retorna o prompt template para responder questões"""
+    return _RESPONDER_PROMPT
 
 
 # ============ PROMPT PARA BUSCA SEMÂNTICA ============
@@ -129,4 +133,15 @@ Consulta otimizada:"""
 
 def get_query_rewrite_prompt() -> PromptTemplate:
     """Retorna prompt para reescrita de queries"""
-    return PromptTemplate.from_template(QUERY_REWRITE_TEMPLATE)
\ No newline at end of file
+    return _QUERY_REWRITE_PROMPT
+
+
+# ============ INSTÂNCIAS PRONTAS ============
+# Parsers e prompts não guardam estado: montados (e com format_instructions
+# já resolvidas) uma única vez na importação
+QUESTOES_PARSER = JsonOutputParser(pydantic_object=QuestoesOutput)
+RESPOSTA_PARSER = JsonOutputParser(pydantic_object=RespostaOutput)
+
+_GERAR_QUESTOES_PROMPT = _build_gerar_questoes_prompt()
+_RESPONDER_PROMPT = _build_responder_prompt()
+_QUERY_REWRITE_PROMPT = PromptTemplate.from_template(QUERY_REWRITE_TEMPLATE)
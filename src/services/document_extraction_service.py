@@ -1,93 +1,177 @@
 import re
 import os
+import asyncio
+import multiprocessing
 import pymupdf
-import json
-from typing import List, Dict, Any
+import orjson
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 import logging
 from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from core.config import settings
 from services.vectorstore_service import vectorstore_service
+from services.semantic_cache import semantic_query_cache
 
 logger = logging.getLogger(__name__)
 
 
-class DocumentExtractionService:
-    """Serviço para extrair artigos de PDFs e indexar no vector store"""
+# Cabeçalho de artigo: "Art. N" fora de citações entre aspas.
+# Grupos: rótulo ("Art. 5º") e numeração ("5"); usado com re.split, o corpo
+# de cada artigo é o trecho entre um cabeçalho e o seguinte
+PADRAO_ARTIGO = re.compile(r"(?<!['\"])\b(Art\.\s*(\d+)[ºo]?)")
+
+# Número da lei no título ("LEI Nº 8.112, DE 11 ..." -> "8112")
+PADRAO_NUMERO_LEI = re.compile(r"\d{1,3}(?:\.\d{3})+|\d+")
+
+# Processos para extração de PDFs (parse do PyMuPDF e regex são CPU-bound)
+MAX_PROCESSOS_EXTRACAO = min(os.cpu_count() or 1, 8)
+
+# Separadores para dividir artigos longos, do mais ao menos estrutural
+# (o texto do artigo já vem com as quebras de linha normalizadas em espaços)
+SEPARADORES_CHUNK = ["§", "; ", ". ", " ", ""]
+
+# Documentos por chamada de embedding/bulk e lotes indexados simultaneamente
+LOTE_INDEXACAO = 64
+LOTES_SIMULTANEOS = 4
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _obter_executor() -> ProcessPoolExecutor:
+    """Cria o pool de processos no primeiro uso"""
+    global _executor
+    if _executor is None:
+        # forkserver: o processo já tem threads (to_thread, pools HTTP) e fork
+        # delas pode travar os filhos
+        _executor = ProcessPoolExecutor(
+            max_workers=MAX_PROCESSOS_EXTRACAO,
+            mp_context=multiprocessing.get_context("forkserver")
+        )
+    return _executor
+
+
+def encerrar_executor():
+    """Encerra o pool de processos de extração, se tiver sido criado"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _extrair_artigos(caminho_pdf: str, conteudo: Optional[bytes] = None) -> List[Dict[str, Any]]:
+    """
+    Extrai os artigos de um PDF (do disco ou dos bytes em `conteudo`).
+    
+    Função de módulo para poder ser enviada ao pool de processos;
+    erros são propagados para quem chamou.
+    """
+    artigos = []
+    partes_texto = []
+    blocos_primeira_pagina = []
+    
+    if conteudo is not None:
+        documento = pymupdf.open(stream=conteudo, filetype="pdf")
+    else:
+        documento = pymupdf.open(caminho_pdf)
     
-    def __init__(self):
-        self.padrao_artigo = r"(?<!['\"])\b(Art\.\s*\d+[ºo]?)\s*(.*?)(?=\s*(?<!['\"])\bArt\.\s*\d+[ºo]?|\Z)"
+    with documento as pdf_file:
+        for i, page in enumerate(pdf_file):
+            texto_pagina = page.get_text()
+            partes_texto.append(texto_pagina)
+            # Só a primeira página tem o título; as demais não precisam dos blocos
+            if i == 0 and texto_pagina.strip():
+                blocos_primeira_pagina = page.get_text("blocks", sort=False)
     
-    def processar_pdf(self, caminho_pdf: str) -> List[Dict[str, Any]]:
-        """Processa um único PDF e extrai artigos"""
-        artigos = []
-        texto = ""
-        bloco_textual = []
+    texto = "".join(partes_texto)
+    
+    # PDF escaneado (só imagem): não há o que extrair
+    if not texto.strip():
+        logger.warning(f"⚠️ {os.path.basename(caminho_pdf)} sem texto extraível (talvez OCR necessário)")
+        return []
 
-        try:
-            with pymupdf.open(caminho_pdf) as pdf_file:
-                for page in pdf_file:
-                    texto += page.get_text()
-                    bloco_textual.append(page.get_text("blocks", sort=False))
+    # Nome da Lei (título no topo da primeira página)
+    try:
+        nome_lei = blocos_primeira_pagina[2][4][:-1]
+    except Exception:
+        nome_lei = os.path.basename(caminho_pdf).replace(".pdf", "")
 
-            # Nome da Lei (título no topo da primeira página)
-            try:
-                nome_lei = bloco_textual[0][2][4][:-1]
-            except Exception:
-                nome_lei = os.path.basename(caminho_pdf).replace(".pdf", "")
-
-            correspondencia = re.findall(self.padrao_artigo, texto, re.DOTALL)
-
-            # Contador de repetições
-            contador_artigos = {}
-            for numero_artigo, _ in correspondencia:
-                numeracao = re.search(r'\d+', numero_artigo).group()
-                chave = f"Art. {numeracao}"
-                contador_artigos[chave] = contador_artigos.get(chave, 0) + 1
-
-            for numero_artigo, texto_artigo in correspondencia:
-                numeracao = re.search(r'\d+', numero_artigo).group()
-                chave = f"Art. {numeracao}"
-                corpo_texto_artigo = ' '.join(texto_artigo.strip().split())
-                
-                # Determina se está em vigor
-                em_vigor = True
-                if contador_artigos[chave] > 1:
-                    corpo_texto_artigo += " (VETADO)"
-                    contador_artigos[chave] -= 1
-                    em_vigor = False
-
-                artigos.append({
-                    "area": "Direito Administrativo",
-                    "titulo": nome_lei,
-                    "numero": numero_artigo.strip(),
-                    "conteudo": corpo_texto_artigo,
-                    "em_vigor": em_vigor,
-                    "arquivo_origem": os.path.basename(caminho_pdf)
-                })
-
-            logger.info(f"✅ Extraídos {len(artigos)} artigos de {os.path.basename(caminho_pdf)}")
-            return artigos
-            
-        except Exception as e:
-            logger.error(f"❌ Erro ao processar {caminho_pdf}: {e}")
+    # [preâmbulo, rótulo1, numeração1, corpo1, rótulo2, numeração2, corpo2, ...]
+    partes = PADRAO_ARTIGO.split(texto)
+    numeracoes = partes[2::3]
+
+    # Repetições por numeração (contadas em C, direto da fatia do split).
+    # Só a última ocorrência de cada número está em vigor; as anteriores são vetadas
+    restantes = Counter(numeracoes)
+
+    for numero_artigo, numeracao, texto_artigo in zip(partes[1::3], numeracoes, partes[3::3]):
+        corpo_texto_artigo = ' '.join(texto_artigo.strip().split())
+        
+        restantes[numeracao] -= 1
+        em_vigor = restantes[numeracao] == 0
+        if not em_vigor:
+            corpo_texto_artigo += " (VETADO)"
+
+        artigos.append({
+            "area": "Direito Administrativo",
+            "titulo": nome_lei,
+            "numero": numero_artigo.strip(),
+            "conteudo": corpo_texto_artigo,
+            "em_vigor": em_vigor,
+            "arquivo_origem": os.path.basename(caminho_pdf)
+        })
+
+    return artigos
+
+
+class DocumentExtractionService:
+    """Serviço para extrair artigos de PDFs e indexar no vector store"""
+    
+    async def processar_pasta(self, caminho_pasta: str) -> List[Dict[str, Any]]:
+        """Processa todos os PDFs de uma pasta em paralelo, fora do event loop"""
+        try:
+            with os.scandir(caminho_pasta) as entradas:
+                caminhos_pdf = [
+                    (entrada.path, None)
+                    for entrada in entradas
+                    if entrada.name.lower().endswith(".pdf") and entrada.is_file()
+                ]
+        except (FileNotFoundError, NotADirectoryError):
+            logger.error(f"❌ Pasta não encontrada: {caminho_pasta}")
             return []
+        
+        return await self._processar_em_paralelo(caminhos_pdf)
+    
+    async def processar_arquivos(self, arquivos: List[Tuple[str, bytes]]) -> List[Dict[str, Any]]:
+        """Processa PDFs recebidos em memória como pares (nome, bytes)"""
+        return await self._processar_em_paralelo(arquivos)
     
-    def processar_pasta(self, caminho_pasta: str) -> List[Dict[str, Any]]:
-        """Processa todos os PDFs de uma pasta"""
+    async def _processar_em_paralelo(
+        self,
+        pdfs: List[Tuple[str, Optional[bytes]]]
+    ) -> List[Dict[str, Any]]:
+        """Extrai os PDFs no pool de processos, sem bloquear o event loop"""
         todos_artigos = []
+        loop = asyncio.get_running_loop()
+        executor = _obter_executor()
         
-        if not os.path.exists(caminho_pasta):
-            logger.error(f"❌ Pasta não encontrada: {caminho_pasta}")
-            return []
+        async def _processar(nome: str, conteudo: Optional[bytes]) -> List[Dict[str, Any]]:
+            logger.info(f"🔍 Processando: {os.path.basename(nome)}")
+            try:
+                artigos = await loop.run_in_executor(executor, _extrair_artigos, nome, conteudo)
+            except Exception as e:
+                logger.error(f"❌ Erro ao processar {nome}: {e}")
+                return []
+            logger.info(f"✅ Extraídos {len(artigos)} artigos de {os.path.basename(nome)}")
+            return artigos
         
-        for arquivo in os.listdir(caminho_pasta):
-            if arquivo.lower().endswith(".pdf"):
-                caminho_pdf = os.path.join(caminho_pasta, arquivo)
-                logger.info(f"🔍 Processando: {arquivo}")
-                artigos_extraidos = self.processar_pdf(caminho_pdf)
-                todos_artigos.extend(artigos_extraidos)
+        # gather preserva a ordem dos arquivos no resultado
+        resultados = await asyncio.gather(*(_processar(n, c) for n, c in pdfs))
+        for artigos_extraidos in resultados:
+            todos_artigos.extend(artigos_extraidos)
         
         logger.info(f"✅ Total de artigos extraídos: {len(todos_artigos)}")
         return todos_artigos
@@ -95,53 +179,62 @@ class DocumentExtractionService:
     def salvar_json(self, artigos: List[Dict[str, Any]], caminho_json: str):
         """Salva artigos em arquivo JSON"""
         try:
-            with open(caminho_json, "w", encoding="utf-8") as f:
-                json.dump(artigos, f, ensure_ascii=False, indent=2)
+            # orjson serializa direto para bytes UTF-8, sem str intermediária
+            with open(caminho_json, "wb") as f:
+                f.write(orjson.dumps(artigos, option=orjson.OPT_INDENT_2))
             logger.info(f"✅ Artigos salvos em: {caminho_json}")
         except Exception as e:
             logger.error(f"❌ Erro ao salvar JSON: {e}")
     
     def criar_chunks(self, artigos: List[Dict[str, Any]], chunk_size: int = 1000) -> List[Document]:
-        """Converte artigos em chunks para o vector store"""
+        """
+        Converte artigos em chunks para o vector store.
+        
+        Artigos longos são divididos nos limites de parágrafo (§), inciso ou
+        frase, com sobreposição de ~10% entre chunks vizinhos.
+        """
         documentos = []
+        divisor = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_size // 10,
+            separators=SEPARADORES_CHUNK
+        )
         
         for artigo in artigos:
             conteudo = artigo["conteudo"]
+            numero = artigo["numero"]
+            metadata_base = {
+                "area": artigo["area"],
+                "titulo": artigo["titulo"],
+                "numero": numero,
+                "em_vigor": artigo["em_vigor"],
+                "arquivo_origem": artigo["arquivo_origem"]
+            }
+            # Permite filtrar a busca por lei direto no OpenSearch
+            numero_lei = PADRAO_NUMERO_LEI.search(artigo["titulo"])
+            if numero_lei:
+                metadata_base["lei_numero"] = numero_lei.group().replace(".", "")
             
             # Se o artigo é pequeno, usa como um chunk único
             if len(conteudo) <= chunk_size:
-                doc = Document(
-                    page_content=f"{artigo['numero']}: {conteudo}",
-                    metadata={
-                        "area": artigo["area"],
-                        "titulo": artigo["titulo"],
-                        "numero": artigo["numero"],
-                        "em_vigor": artigo["em_vigor"],
-                        "arquivo_origem": artigo["arquivo_origem"],
-                        "tipo": "artigo_completo"
-                    }
-                )
-                documentos.append(doc)
+                documentos.append(Document(
+                    page_content=f"{numero}: {conteudo}",
+                    metadata={**metadata_base, "tipo": "artigo_completo"}
+                ))
             else:
-                # Divide artigos grandes em chunks menores
-                palavras = conteudo.split()
-                for i in range(0, len(palavras), chunk_size // 10):  # ~100 palavras por chunk
-                    chunk_palavras = palavras[i:i + chunk_size // 10]
-                    chunk_texto = " ".join(chunk_palavras)
-                    
-                    doc = Document(
-                        page_content=f"{artigo['numero']} (parte {i//100 + 1}): {chunk_texto}",
+                # Divide artigos grandes em chunks menores; o título da lei vai
+                # no prefixo para que cada parte seja recuperável isoladamente
+                partes = divisor.split_text(conteudo)
+                for indice, chunk_texto in enumerate(partes):
+                    documentos.append(Document(
+                        page_content=f"{artigo['titulo']} — {numero} (parte {indice + 1}): {chunk_texto}",
                         metadata={
-                            "area": artigo["area"],
-                            "titulo": artigo["titulo"],
-                            "numero": artigo["numero"],
-                            "em_vigor": artigo["em_vigor"],
-                            "arquivo_origem": artigo["arquivo_origem"],
+                            **metadata_base,
                             "tipo": "artigo_chunk",
-                            "chunk_index": i//100
+                            "chunk_index": indice,
+                            "total_chunks": len(partes)
                         }
-                    )
-                    documentos.append(doc)
+                    ))
         
         return documentos
     
@@ -156,21 +249,29 @@ class DocumentExtractionService:
             # Cria índice se não existir
             await vectorstore_service.criar_indice()
             
-            # Processa em lotes menores para evitar erro de bulk_size
-            batch_size = 100  # Reduzido de 500 para 100
+            # Lotes menores evitam erro de bulk_size e cabem no contexto do modelo
+            # de embeddings; alguns lotes rodam ao mesmo tempo para sobrepor
+            # o embedding de um com o bulk de outro
             total_docs = len(documentos)
+            lotes = [documentos[i:i + LOTE_INDEXACAO] for i in range(0, total_docs, LOTE_INDEXACAO)]
+            limite = asyncio.Semaphore(LOTES_SIMULTANEOS)
             
-            logger.info(f"📄 Indexando {total_docs} documentos em lotes de {batch_size}")
+            logger.info(f"📄 Indexando {total_docs} documentos em {len(lotes)} lotes de {LOTE_INDEXACAO}")
             
-            for i in range(0, total_docs, batch_size):
-                batch = documentos[i:i + batch_size]
-                logger.info(f"📦 Processando lote {i//batch_size + 1}/{(total_docs + batch_size - 1)//batch_size}")
-                
-                ids = await vectorstore_service.adicionar_documentos(batch)
-                
-                if not ids:
-                    logger.error(f"❌ Falha ao indexar lote {i//batch_size + 1}")
-                    return False
+            async def _indexar_lote(numero: int, lote: List[Document]) -> bool:
+                async with limite:
+                    logger.info(f"📦 Processando lote {numero}/{len(lotes)}")
+                    ids = await vectorstore_service.adicionar_documentos(lote)
+                    if not ids:
+                        logger.error(f"❌ Falha ao indexar lote {numero}")
+                        return False
+                    return True
+            
+            resultados = await asyncio.gather(
+                *(_indexar_lote(i, lote) for i, lote in enumerate(lotes, 1))
+            )
+            if not all(resultados):
+                return False
             
             logger.info(f"✅ Todos os {total_docs} documentos indexados com sucesso")
             return True
@@ -181,14 +282,23 @@ class DocumentExtractionService:
     
     async def processar_e_indexar(
         self, 
-        caminho_pasta: str, 
+        caminho_pasta: Optional[str] = None, 
         salvar_json: bool = True,
-        incluir_vetados: bool = True
+        incluir_vetados: bool = True,
+        arquivos: Optional[List[Tuple[str, bytes]]] = None
     ) -> dict:
-        """Pipeline completo: extrai PDFs, cria chunks e indexa"""
+        """
+        Pipeline completo: extrai PDFs, cria chunks e indexa.
+        
+        Os PDFs vêm de `caminho_pasta` ou, sem passar pelo disco, de
+        `arquivos` (pares nome/bytes). O JSON só é salvo quando há pasta.
+        """
         try:
             # 1. Extrai artigos dos PDFs
-            artigos = self.processar_pasta(caminho_pasta)
+            if arquivos is not None:
+                artigos = await self.processar_arquivos(arquivos)
+            else:
+                artigos = await self.processar_pasta(caminho_pasta)
             if not artigos:
                 logger.error("❌ Nenhum artigo extraído")
                 return {"sucesso": False}
@@ -207,7 +317,7 @@ class DocumentExtractionService:
                 logger.info(f"📋 Indexando apenas artigos em vigor: {len(artigos_para_indexar)}")
             
             # 4. Salva JSON se solicitado
-            if salvar_json:
+            if salvar_json and caminho_pasta:
                 caminho_json = os.path.join(caminho_pasta, "leis_unificadas.json")
                 self.salvar_json(artigos, caminho_json)
             
@@ -219,6 +329,8 @@ class DocumentExtractionService:
             sucesso_indexacao = await self.indexar_documentos(documentos)
             
             if sucesso_indexacao:
+                # Buscas em cache não refletem os novos documentos
+                semantic_query_cache.limpar()
                 logger.info("🎉 Pipeline concluído com sucesso!")
                 return {
                     "sucesso": True,
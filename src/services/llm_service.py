@@ -2,13 +2,28 @@
 """
 Serviço de LLM usando Ollama via LangChain.
 """
+import asyncio
 import logging
-from typing import List, Optional
+import time
+from functools import lru_cache
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import httpx
+from langchain_core.embeddings import Embeddings
 
 from core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Resultado de verificar_ollama reaproveitado por alguns segundos
+OLLAMA_STATUS_TTL = 5.0
+
+_http: Optional[httpx.AsyncClient] = None
+_status_cache: Optional[Tuple[float, dict]] = None
+
+# Gerações em andamento, compartilhadas por chamadas simultâneas idênticas
+_geracoes_pendentes: Dict[Hashable, asyncio.Future] = {}
+
 # Imports com fallback
 try:
     from langchain_ollama import ChatOllama, OllamaEmbeddings
@@ -19,73 +34,195 @@ except ImportError:
     from langchain_community.embeddings import OllamaEmbeddings
 
 
-def get_llm(temperature: float = 0.7, model: str = None) -> ChatOllama:
-    """Retorna instância do ChatOllama configurada."""
+@lru_cache(maxsize=16)
+def _criar_llm(base_url: str, model: str, temperature: float) -> ChatOllama:
+    """Uma instância por configuração, reaproveitando o cliente HTTP e suas conexões"""
     return ChatOllama(
-        base_url=settings.OLLAMA_BASE_URL,
-        model=model or settings.OLLAMA_MODEL,
+        base_url=base_url,
+        model=model,
         temperature=temperature,
     )
 
 
+@lru_cache(maxsize=4)
+def _criar_embeddings(base_url: str, model: str) -> OllamaEmbeddings:
+    return OllamaEmbeddings(
+        base_url=base_url,
+        model=model
+    )
+
+
+class InfinityEmbeddings(Embeddings):
+    """
+    Embeddings servidos por um Infinity/TEI (API /embeddings compatível com OpenAI).
+    
+    O servidor agrupa dinamicamente as requisições simultâneas em lotes na GPU;
+    cada lista de textos vai em uma única requisição. O POST vai para
+    `{base_url}/embeddings`: para o TEI, a base_url inclui o prefixo `/v1`.
+    """
+    
+    def __init__(self, base_url: str, model: str, timeout: float = 60.0):
+        self._url = f"{base_url.rstrip('/')}/embeddings"
+        self._model = model
+        self._timeout = timeout
+        self._cliente: Optional[httpx.Client] = None
+        self._cliente_async: Optional[httpx.AsyncClient] = None
+    
+    def _corpo(self, textos: List[str]) -> dict:
+        return {"input": textos, "model": self._model}
+    
+    @staticmethod
+    def _vetores(resposta: httpx.Response) -> List[List[float]]:
+        resposta.raise_for_status()
+        dados = sorted(resposta.json()["data"], key=lambda item: item["index"])
+        return [item["embedding"] for item in dados]
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        if self._cliente is None:
+            self._cliente = httpx.Client(timeout=self._timeout)
+        return self._vetores(self._cliente.post(self._url, json=self._corpo(texts)))
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        if self._cliente_async is None:
+            self._cliente_async = httpx.AsyncClient(timeout=self._timeout)
+        return self._vetores(await self._cliente_async.post(self._url, json=self._corpo(texts)))
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+    
+    async def aclose(self):
+        """Fecha os clientes HTTP criados sob demanda"""
+        if self._cliente is not None:
+            self._cliente.close()
+            self._cliente = None
+        if self._cliente_async is not None:
+            await self._cliente_async.aclose()
+            self._cliente_async = None
+
+
+def get_llm(temperature: float = 0.7, model: str = None) -> ChatOllama:
+    """Retorna instância do ChatOllama configurada."""
+    return _criar_llm(settings.OLLAMA_BASE_URL, model or settings.OLLAMA_MODEL, temperature)
+
+
 def get_llm_creative(temperature: float = 0.8) -> ChatOllama:
     """LLM com maior criatividade para geração de questões variadas"""
-    return ChatOllama(
-        base_url=settings.OLLAMA_BASE_URL,
-        model=settings.OLLAMA_MODEL,
-        temperature=temperature,
-    )
+    return _criar_llm(settings.OLLAMA_BASE_URL, settings.OLLAMA_MODEL, temperature)
 
 
 def get_llm_precise(temperature: float = 0.2) -> ChatOllama:
     """LLM com baixa temperatura para respostas precisas"""
-    return ChatOllama(
-        base_url=settings.OLLAMA_BASE_URL,
-        model=settings.OLLAMA_MODEL,
-        temperature=temperature,
-    )
+    return _criar_llm(settings.OLLAMA_BASE_URL, settings.OLLAMA_MODEL, temperature)
 
 
-def get_embeddings() -> OllamaEmbeddings:
-    """Retorna instância do OllamaEmbeddings configurada."""
-    return OllamaEmbeddings(
-        base_url=settings.OLLAMA_BASE_URL,
-        model=settings.OLLAMA_EMBEDDING_MODEL
-    )
+@lru_cache(maxsize=4)
+def _criar_embeddings_infinity(base_url: str, model: str) -> InfinityEmbeddings:
+    return InfinityEmbeddings(base_url=base_url, model=model)
+
+
+def get_embeddings() -> Embeddings:
+    """Retorna o modelo de embeddings do backend configurado (Ollama ou Infinity/TEI)."""
+    if settings.EMBEDDINGS_BACKEND == "infinity":
+        return _criar_embeddings_infinity(settings.INFINITY_BASE_URL, settings.INFINITY_EMBEDDING_MODEL)
+    return _criar_embeddings(settings.OLLAMA_BASE_URL, settings.OLLAMA_EMBEDDING_MODEL)
+
+
+def assinatura_embeddings() -> str:
+    """Identifica backend e modelo dos embeddings (vetores de modelos diferentes não se misturam)"""
+    if settings.EMBEDDINGS_BACKEND == "infinity":
+        return f"infinity:{settings.INFINITY_EMBEDDING_MODEL}"
+    return f"ollama:{settings.OLLAMA_EMBEDDING_MODEL}"
+
+
+async def invocar_compartilhado(chain, entrada: Dict[str, Any], chave: Hashable) -> Any:
+    """
+    Executa `chain.ainvoke(entrada)`.
+    
+    Chamadas simultâneas com a mesma chave (ex.: requisição repetida pelo
+    cliente) aguardam uma única geração no Ollama. Gerações diferentes já
+    rodam em paralelo; o paralelismo real é o OLLAMA_NUM_PARALLEL do servidor.
+    """
+    tarefa = _geracoes_pendentes.get(chave)
+    if tarefa is None:
+        tarefa = asyncio.ensure_future(chain.ainvoke(entrada))
+        _geracoes_pendentes[chave] = tarefa
+        tarefa.add_done_callback(lambda _: _geracoes_pendentes.pop(chave, None))
+    return await asyncio.shield(tarefa)
+
+
+def _cliente_http() -> httpx.AsyncClient:
+    """Cliente HTTP compartilhado (keep-alive) para as verificações do Ollama"""
+    global _http
+    if _http is None:
+        _http = httpx.AsyncClient(
+            timeout=5.0,
+            limits=httpx.Limits(max_keepalive_connections=4)
+        )
+    return _http
+
+
+async def fechar_cliente_http():
+    """Fecha o cliente HTTP compartilhado (shutdown da aplicação)"""
+    global _http
+    if _http is not None:
+        await _http.aclose()
+        _http = None
+
+
+async def fechar_embeddings():
+    """Fecha os clientes HTTP do backend de embeddings Infinity/TEI (shutdown da aplicação)"""
+    if settings.EMBEDDINGS_BACKEND == "infinity":
+        await get_embeddings().aclose()
 
 
 async def verificar_ollama() -> dict:
     """Verifica se o Ollama está disponível e lista modelos"""
-    import httpx
+    global _status_cache
+    
+    if _status_cache and time.monotonic() - _status_cache[0] < OLLAMA_STATUS_TTL:
+        return _status_cache[1]
     
+    status = await _consultar_ollama()
+    _status_cache = (time.monotonic(), status)
+    return status
+
+
+async def _consultar_ollama() -> dict:
+    """Consulta /api/tags e monta o status do Ollama"""
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(f"{settings.OLLAMA_BASE_URL}/api/tags")
+        response = await _cliente_http().get(f"{settings.OLLAMA_BASE_URL}/api/tags")
+        
+        if response.status_code == 200:
+            data = response.json()
+            modelos = [m['name'] for m in data.get('models', [])]
+            
+            # Extrai nome base do modelo configurado (sem :latest, :3b, etc)
+            modelo_llm_base = settings.OLLAMA_MODEL.split(':')[0]
+            modelo_emb_base = settings.OLLAMA_EMBEDDING_MODEL.split(':')[0]
+            
+            # Verifica se algum modelo disponível começa com o nome base
+            modelo_llm_ok = any(m.startswith(modelo_llm_base) for m in modelos)
+            modelo_emb_ok = any(m.startswith(modelo_emb_base) for m in modelos)
             
-            if response.status_code == 200:
-                data = response.json()
-                modelos = [m['name'] for m in data.get('models', [])]
-                
-                # Extrai nome base do modelo configurado (sem :latest, :3b, etc)
-                modelo_llm_base = settings.OLLAMA_MODEL.split(':')[0]
-                modelo_emb_base = settings.OLLAMA_EMBEDDING_MODEL.split(':')[0]
-                
-                # Verifica se algum modelo disponível começa com o nome base
-                modelo_llm_ok = any(m.startswith(modelo_llm_base) for m in modelos)
-                modelo_emb_ok = any(m.startswith(modelo_emb_base) for m in modelos)
-                
-                return {
-                    "disponivel": True,
-                    "modelos": modelos,
-                    "modelo_llm": {
-                        "configurado": settings.OLLAMA_MODEL,
-                        "disponivel": modelo_llm_ok
-                    },
-                    "modelo_embedding": {
-                        "configurado": settings.OLLAMA_EMBEDDING_MODEL,
-                        "disponivel": modelo_emb_ok
-                    }
+            return {
+                "disponivel": True,
+                "modelos": modelos,
+                "modelo_llm": {
+                    "configurado": settings.OLLAMA_MODEL,
+                    "disponivel": modelo_llm_ok
+                },
+                "modelo_embedding": {
+                    "configurado": settings.OLLAMA_EMBEDDING_MODEL,
+                    "disponivel": modelo_emb_ok
                 }
+            }
     except Exception as e:
         logger.error(f"Erro ao verificar Ollama: {e}")
     
@@ -1,7 +1,13 @@
+import asyncio
+import hashlib
 import logging
-from typing import List
+import time
+from collections import OrderedDict
+from typing import Any, List, Optional, Set, Tuple
 from langchain_core.documents import Document
 
+import numpy as np
+
 from models.schemas import (
     CriarPerguntasRequest,
     CriarPerguntasResponse,
@@ -12,15 +18,122 @@ from models.schemas import (
 )
 from services.rag_chain import RAGChainService
 from services.vectorstore_service import vectorstore_service
+from services.semantic_cache import semantic_answer_cache, semantic_query_cache
 
 logger = logging.getLogger(__name__)
 
+# Cache de respostas por questão (pergunta + alternativas + contexto)
+RESPOSTAS_CACHE_SIZE = 1024
+RESPOSTAS_TTL = 3600.0
+
+# Cache de questões similares por tema normalizado
+SIMILARES_CACHE_SIZE = 256
+SIMILARES_TTL = 300.0
+
+# Máximo de bits diferentes entre SimHashes de perguntas consideradas iguais
+# (conservador: acima disso aceita perguntas com menos de 80% das palavras em comum)
+SIMHASH_MAX_DISTANCIA = 4
+
+
+def _simhash64(texto: str) -> int:
+    """
+    SimHash de 64 bits das palavras do texto.
+    
+    Textos com muitas palavras em comum diferem em poucos bits, então a
+    comparação vira um XOR e uma contagem de bits. Usa blake2b (e não hash())
+    para que o valor seja estável entre processos e possa ser persistido.
+    """
+    pesos = [0] * 64
+    for palavra in texto.lower().split():
+        h = int.from_bytes(hashlib.blake2b(palavra.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            pesos[bit] += 1 if (h >> bit) & 1 else -1
+    
+    return sum(1 << bit for bit in range(64) if pesos[bit] > 0)
+
+
+def _normalizar_pergunta(pergunta: str) -> str:
+    """Minúsculas e espaços colapsados: forma usada nas comparações e hashes"""
+    return " ".join(pergunta.lower().split())
+
+
+def _hash_complemento(request: ResponderPerguntaRequest) -> str:
+    """
+    SHA-256 das alternativas e do contexto adicional normalizados.
+    
+    Mesmo enunciado com alternativas ou contexto diferentes é outra questão:
+    respostas salvas só são reaproveitadas quando este hash coincide.
+    """
+    partes = [_normalizar_pergunta(alt) for alt in (request.alternativas or [])]
+    partes.append(_normalizar_pergunta(request.contexto_adicional or ""))
+    return hashlib.sha256("\x1f".join(partes).encode("utf-8")).hexdigest()
+
+
+# Textos aceitos como verdadeiro (os do pydantic e equivalentes em português)
+VALORES_VERDADEIROS = frozenset({"true", "t", "yes", "y", "on", "1", "sim", "s", "verdadeiro", "v"})
+
+
+def _como_bool(valor: Any) -> bool:
+    """Interpreta booleanos vindos do LLM ("true", "sim", 1...)"""
+    if isinstance(valor, str):
+        return valor.strip().lower() in VALORES_VERDADEIROS
+    return bool(valor)
+
+
+class _CacheTTL:
+    """Cache LRU em memória com validade por item"""
+    
+    def __init__(self, max_itens: int, ttl: float):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        # chave -> (valor, expira_em), em ordem de uso
+        self._itens: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+    
+    def obter(self, chave: str) -> Optional[Any]:
+        """Retorna o valor em cache se ainda válido"""
+        item = self._itens.get(chave)
+        if item is None:
+            return None
+        
+        valor, expira_em = item
+        if expira_em < time.monotonic():
+            del self._itens[chave]
+            return None
+        
+        self._itens.move_to_end(chave)
+        return valor
+    
+    def guardar(self, chave: str, valor: Any):
+        """Armazena o valor, descartando o item menos usado se lotado"""
+        self._itens[chave] = (valor, time.monotonic() + self.ttl)
+        self._itens.move_to_end(chave)
+        if len(self._itens) > self.max_itens:
+            self._itens.popitem(last=False)
+    
+    def limpar(self):
+        self._itens.clear()
+
 
 class PerguntasService:
     """Serviço principal que orquestra a geração e resposta de questões"""
     
     def __init__(self):
         self.rag_chain = RAGChainService()
+        self._cache_respostas = _CacheTTL(RESPOSTAS_CACHE_SIZE, RESPOSTAS_TTL)
+        self._cache_similares = _CacheTTL(SIMILARES_CACHE_SIZE, SIMILARES_TTL)
+        # Gravações no vector store em andamento (referência evita coleta pelo GC)
+        self._bg: Set[asyncio.Task] = set()
+    
+    def _em_segundo_plano(self, coro):
+        """Agenda uma gravação sem que a resposta ao usuário espere por ela"""
+        tarefa = asyncio.create_task(coro)
+        self._bg.add(tarefa)
+        tarefa.add_done_callback(self._bg.discard)
+    
+    async def aguardar_gravacoes(self):
+        """Aguarda as gravações pendentes (chamado no encerramento da aplicação)"""
+        if self._bg:
+            await asyncio.gather(*self._bg, return_exceptions=True)
     
     async def criar_perguntas(
         self,
@@ -33,15 +146,19 @@ class PerguntasService:
         questões mais precisas e fundamentadas.
         """
         try:
-            # Busca questões similares existentes
-            questoes_similares = await self._buscar_questoes_similares(request.tema)
+            # Busca questões similares existentes e o contexto em paralelo
+            questoes_similares, docs = await asyncio.gather(
+                self._buscar_questoes_similares(request.tema),
+                self.rag_chain.buscar_contexto(request.tema, k=5)
+            )
             
             resultado = await self.rag_chain.gerar_questoes(
                 tema=request.tema,
                 quantidade=request.quantidade,
                 dificuldade=request.dificuldade,
                 tipo=request.tipo,
-                questoes_existentes=questoes_similares
+                questoes_existentes=questoes_similares,
+                docs=docs
             )
             
             if not resultado.get("sucesso"):
@@ -55,10 +172,11 @@ class PerguntasService:
             # Converte para modelos Pydantic
             questoes = self._processar_questoes(resultado.get("questoes", []))
             
-            # Salva as questões geradas no vector store
-            await self._salvar_questoes(questoes, request)
+            # Salva as questões geradas no vector store, sem atrasar a resposta
+            self._em_segundo_plano(self._salvar_questoes(questoes, request))
             
-            return CriarPerguntasResponse(
+            # Campos já convertidos em _processar_questoes: monta sem revalidar
+            return CriarPerguntasResponse.model_construct(
                 sucesso=True,
                 tema=request.tema,
                 quantidade_gerada=len(questoes),
@@ -84,12 +202,19 @@ class PerguntasService:
         
         Verifica se já existe resposta salva antes de processar.
         """
+        chave = self._chave_questao(request)
+        resposta_cache = self._obter_resposta_cache(chave)
+        if resposta_cache is not None:
+            logger.info("✅ Resposta encontrada no cache em memória")
+            return resposta_cache
+        
         try:
             # 1. Busca se já existe resposta para esta pergunta
-            resposta_existente = await self._buscar_resposta_existente(request.pergunta)
+            resposta_existente = await self._buscar_resposta_existente(request, chave)
             
             if resposta_existente:
                 logger.info("✅ Resposta encontrada no cache")
+                self._guardar_resposta_cache(chave, resposta_existente)
                 return resposta_existente
             
             # 2. Gera nova resposta
@@ -111,7 +236,8 @@ class PerguntasService:
             
             # 3. Salva a resposta para futuras consultas
             if response.sucesso:
-                await self._salvar_resposta(request, response)
+                self._guardar_resposta_cache(chave, response)
+                self._em_segundo_plano(self._salvar_resposta(request, response))
             
             return response
             
@@ -125,32 +251,57 @@ class PerguntasService:
                 fundamento_legal=""
             )
     
+    @staticmethod
+    def _chave_questao(request: ResponderPerguntaRequest) -> str:
+        """Gera chave estável para a questão (pergunta, alternativas e contexto normalizados)"""
+        partes = [_normalizar_pergunta(request.pergunta), _hash_complemento(request)]
+        return hashlib.sha256("\x1f".join(partes).encode("utf-8")).hexdigest()
+    
+    def _obter_resposta_cache(self, chave: str) -> Optional[ResponderPerguntaResponse]:
+        """Retorna a resposta em cache se ainda válida"""
+        return self._cache_respostas.obter(chave)
+    
+    def _guardar_resposta_cache(self, chave: str, resposta: ResponderPerguntaResponse):
+        """Armazena uma resposta bem-sucedida no cache em memória"""
+        self._cache_respostas.guardar(chave, resposta)
+    
     def _processar_questoes(self, questoes_raw: List[dict]) -> List[QuestaoGerada]:
-        """Converte dicts em objetos QuestaoGerada"""
+        """
+        Converte dicts em objetos QuestaoGerada.
+        
+        A saída do parser já tem o formato do schema: os campos são
+        convertidos explicitamente (nulos viram "") e os modelos montados
+        sem validação. Questões sem enunciado são descartadas.
+        """
         questoes = []
         
         for i, q in enumerate(questoes_raw, 1):
             try:
+                enunciado = q.get("enunciado")
+                if not enunciado:
+                    logger.warning(f"Questão {i} sem enunciado descartada")
+                    continue
+                
                 alternativas = None
                 if q.get("alternativas"):
                     alternativas = [
-                        Alternativa(
-                            letra=alt.get("letra", ""),
-                            texto=alt.get("texto", ""),
-                            correta=alt.get("correta", False)
+                        Alternativa.model_construct(
+                            letra=str(alt.get("letra") or ""),
+                            texto=str(alt.get("texto") or ""),
+                            correta=_como_bool(alt.get("correta", False))
                         )
                         for alt in q["alternativas"]
                     ]
                 
-                questao = QuestaoGerada(
-                    numero=q.get("numero", i),
-                    enunciado=q.get("enunciado", ""),
+                fonte_legal = q.get("fonte_legal")
+                questoes.append(QuestaoGerada.model_construct(
+                    numero=int(q.get("numero") or i),
+                    enunciado=str(enunciado),
                     alternativas=alternativas,
-                    resposta_correta=q.get("resposta_correta", ""),
-                    justificativa=q.get("justificativa", ""),
-                    fonte_legal=q.get("fonte_legal")
-                )
-                questoes.append(questao)
+                    resposta_correta=str(q.get("resposta_correta") or ""),
+                    justificativa=str(q.get("justificativa") or ""),
+                    fonte_legal=str(fonte_legal) if fonte_legal is not None else None
+                ))
                 
             except Exception as e:
                 logger.warning(f"Erro ao processar questão {i}: {e}")
@@ -159,7 +310,12 @@ class PerguntasService:
         return questoes
     
     async def _buscar_questoes_similares(self, tema: str) -> List[str]:
-        """Busca questões similares já existentes"""
+        """Busca questões similares já existentes (em cache por tema)"""
+        chave = tema.strip().lower()
+        questoes_cache = self._cache_similares.obter(chave)
+        if questoes_cache is not None:
+            return list(questoes_cache)
+        
         try:
             docs = await vectorstore_service.buscar_similares(
                 query=tema,
@@ -171,6 +327,9 @@ class PerguntasService:
             for doc in docs:
                 questoes_similares.append(doc.page_content)
             
+            # Lista vazia pode ser falha do OpenSearch; não fica em cache
+            if questoes_similares:
+                self._cache_similares.guardar(chave, tuple(questoes_similares))
             return questoes_similares
             
         except Exception as e:
@@ -180,67 +339,100 @@ class PerguntasService:
     async def _salvar_questoes(self, questoes: List[QuestaoGerada], request: CriarPerguntasRequest):
         """Salva questões geradas no vector store"""
         try:
+            # Metadados comuns a todas as questões do pedido
+            metadata_base = {
+                "tipo": "questao",
+                "tema": request.tema,
+                "dificuldade": request.dificuldade,
+                "tipo_questao": request.tipo,
+                "banca": "FCC"
+            }
             documentos = []
             
             for questao in questoes:
                 # Monta o conteúdo da questão
-                conteudo = f"Enunciado: {questao.enunciado}\n"
+                partes = [f"Enunciado: {questao.enunciado}\n"]
                 
                 if questao.alternativas:
-                    conteudo += "Alternativas:\n"
-                    for alt in questao.alternativas:
-                        conteudo += f"{alt.letra}) {alt.texto}\n"
+                    partes.append("Alternativas:\n")
+                    partes.extend(f"{alt.letra}) {alt.texto}\n" for alt in questao.alternativas)
                 
-                conteudo += f"Resposta: {questao.resposta_correta}\n"
-                conteudo += f"Justificativa: {questao.justificativa}"
+                partes.append(f"Resposta: {questao.resposta_correta}\n")
+                partes.append(f"Justificativa: {questao.justificativa}")
                 
-                doc = Document(
-                    page_content=conteudo,
+                documentos.append(Document(
+                    page_content="".join(partes),
                     metadata={
-                        "tipo": "questao",
-                        "tema": request.tema,
-                        "dificuldade": request.dificuldade,
-                        "tipo_questao": request.tipo,
-                        "banca": "FCC",
+                        **metadata_base,
                         "numero": questao.numero,
                         "fonte_legal": questao.fonte_legal or ""
                     }
-                )
-                documentos.append(doc)
+                ))
             
-            await vectorstore_service.adicionar_documentos(documentos)
+            # Uma chamada só: o lote inteiro vai em uma requisição de embedding
+            # (não chamar adicionar_documento por questão)
+            ids = await vectorstore_service.adicionar_documentos(documentos)
+            # Novas questões mudam o resultado das buscas por similares
+            self._cache_similares.limpar()
+            if ids:
+                # ...e das buscas em /documents/buscar, que consultam o mesmo índice
+                semantic_query_cache.limpar()
             logger.info(f"✅ Salvadas {len(documentos)} questões no vector store")
             
         except Exception as e:
             logger.error(f"Erro ao salvar questões: {e}")
     
-    async def _buscar_resposta_existente(self, pergunta: str) -> ResponderPerguntaResponse:
-        """Busca resposta já existente para a pergunta"""
+    async def _buscar_resposta_existente(
+        self,
+        request: ResponderPerguntaRequest,
+        chave: str
+    ) -> Optional[ResponderPerguntaResponse]:
+        """
+        Busca resposta já existente para a questão (`chave` = _chave_questao).
+        
+        Consulta primeiro a questão idêntica já salva, depois o cache
+        semântico de respostas (em memória) e, se não houver hit, as
+        respostas similares salvas no OpenSearch. Nos dois últimos, só
+        valem respostas com as mesmas alternativas e contexto adicional.
+        """
+        pergunta = request.pergunta
         try:
-            docs = await vectorstore_service.buscar_similares(
-                query=pergunta,
+            # 0. Mesma questão (enunciado, alternativas e contexto) já respondida:
+            #    busca exata, sem embedding
+            salvas = await vectorstore_service.buscar_por_metadados(
+                {"tipo": "resposta", "questao_sha256": chave}
+            )
+            if salvas:
+                logger.info("✅ Resposta encontrada por correspondência exata")
+                return self._resposta_de_metadata(pergunta, salvas[0])
+            
+            # Normalização, complemento e SimHash calculados uma vez para todos os candidatos
+            normalizada = _normalizar_pergunta(pergunta)
+            complemento = _hash_complemento(request)
+            simhash = _simhash64(normalizada)
+            vetor = await vectorstore_service.gerar_embedding(pergunta)
+            
+            # 1. Cache semântico: o SimHash confirma que é a mesma pergunta
+            entrada = semantic_answer_cache.buscar(vetor, 1)
+            if entrada and self._perguntas_similares(normalizada, entrada[0], simhash, complemento):
+                logger.info("✅ Resposta encontrada no cache semântico")
+                return self._resposta_de_metadata(pergunta, entrada[0])
+            
+            # 2. Respostas salvas no vector store (sobrevivem a reinícios)
+            docs = await vectorstore_service.buscar_similares_por_vetor(
+                vetor,
                 k=3,
                 filtro={"tipo": "resposta"}
             )
             
             # Verifica se alguma pergunta é muito similar (evita duplicações)
-            for doc in docs:
-                pergunta_salva = doc.metadata.get("pergunta", "")
-                
-                # Comparação simples de similaridade
-                if self._perguntas_similares(pergunta, pergunta_salva):
-                    logger.info(f"✅ Resposta encontrada para pergunta similar")
-                    metadata = doc.metadata
-                    
-                    return ResponderPerguntaResponse(
-                        sucesso=True,
-                        pergunta=pergunta,  # Usa a pergunta atual
-                        resposta_correta=metadata.get("resposta_correta", ""),
-                        explicacao_detalhada=metadata.get("explicacao_detalhada", ""),
-                        fundamento_legal=metadata.get("fundamento_legal", ""),
-                        dicas_estudo=metadata.get("dicas_estudo", []),
-                        referencias=metadata.get("referencias", [])
-                    )
+            metadata = self._candidato_mais_proximo(
+                normalizada, [doc.metadata for doc in docs], simhash, complemento
+            )
+            if metadata is not None:
+                logger.info(f"✅ Resposta encontrada para pergunta similar")
+                semantic_answer_cache.guardar(vetor, 1, [metadata])
+                return self._resposta_de_metadata(pergunta, metadata)
             
             return None
             
@@ -248,56 +440,101 @@ class PerguntasService:
             logger.warning(f"Erro ao buscar resposta existente: {e}")
             return None
     
-    def _perguntas_similares(self, pergunta1: str, pergunta2: str) -> bool:
-        """Verifica se duas perguntas são muito similares"""
-        # Remove espaços e converte para minúsculo
-        p1 = pergunta1.lower().strip()
-        p2 = pergunta2.lower().strip()
-        
-        # Se são idênticas
-        if p1 == p2:
-            return True
+    @staticmethod
+    def _resposta_de_metadata(pergunta: str, metadata: dict) -> ResponderPerguntaResponse:
+        """Reconstrói a resposta salva a partir dos metadados"""
+        return ResponderPerguntaResponse(
+            sucesso=True,
+            pergunta=pergunta,  # Usa a pergunta atual
+            resposta_correta=metadata.get("resposta_correta", ""),
+            explicacao_detalhada=metadata.get("explicacao_detalhada", ""),
+            fundamento_legal=metadata.get("fundamento_legal", ""),
+            dicas_estudo=metadata.get("dicas_estudo", []),
+            referencias=metadata.get("referencias", [])
+        )
+    
+    def _perguntas_similares(self, normalizada: str, metadata: dict, simhash: int, complemento: str) -> bool:
+        """
+        Verifica se a pergunta salva em `metadata` é muito similar à pergunta atual
+        (recebida já normalizada, junto com seu SimHash e hash do complemento)
+        """
+        return self._candidato_mais_proximo(normalizada, [metadata], simhash, complemento) is not None
+    
+    @staticmethod
+    def _candidato_mais_proximo(
+        normalizada: str,
+        metadados: List[dict],
+        simhash: int,
+        complemento: str
+    ) -> Optional[dict]:
+        """
+        Entre as respostas salvas com as mesmas alternativas e contexto
+        (`complemento`), retorna a de pergunta idêntica ou, senão, a de
+        SimHash mais próximo dentro de SIMHASH_MAX_DISTANCIA (None se nenhuma)
+        """
+        metadados = [m for m in metadados if m.get("complemento_sha256") == complemento]
+        if not metadados:
+            return None
         
-        # Verifica similaridade por palavras-chave
-        palavras1 = set(p1.split())
-        palavras2 = set(p2.split())
+        perguntas_salvas = [_normalizar_pergunta(m.get("pergunta", "")) for m in metadados]
         
-        # Se mais de 80% das palavras são comuns
-        intersecao = len(palavras1.intersection(palavras2))
-        uniao = len(palavras1.union(palavras2))
+        # Se são idênticas
+        for metadata, pergunta_salva in zip(metadados, perguntas_salvas):
+            if normalizada == pergunta_salva:
+                return metadata
         
-        similaridade = intersecao / uniao if uniao > 0 else 0
-        return similaridade > 0.8
+        # Distâncias de Hamming de todos os candidatos em uma operação (XOR + popcount).
+        # Respostas salvas antes do SimHash não têm o campo: calcula na hora
+        assinaturas = np.fromiter(
+            (
+                int(m["simhash"], 16) if m.get("simhash") else _simhash64(p)
+                for m, p in zip(metadados, perguntas_salvas)
+            ),
+            dtype=np.uint64,
+            count=len(metadados)
+        )
+        distancias = np.bitwise_count(assinaturas ^ np.uint64(simhash))
+        melhor = int(distancias.argmin())
+        return metadados[melhor] if distancias[melhor] <= SIMHASH_MAX_DISTANCIA else None
     
     async def _salvar_resposta(self, request: ResponderPerguntaRequest, response: ResponderPerguntaResponse):
         """Salva resposta no vector store para cache"""
         try:
+            normalizada = _normalizar_pergunta(request.pergunta)
+            
             # Monta conteúdo da resposta
-            conteudo = f"Pergunta: {request.pergunta}\n"
+            partes = [f"Pergunta: {request.pergunta}\n"]
             
             if request.alternativas:
-                conteudo += "Alternativas:\n"
-                for alt in request.alternativas:
-                    conteudo += f"{alt}\n"
+                partes.append("Alternativas:\n")
+                partes.extend(f"{alt}\n" for alt in request.alternativas)
             
-            conteudo += f"\nResposta Correta: {response.resposta_correta}\n"
-            conteudo += f"Explicação: {response.explicacao_detalhada}\n"
-            conteudo += f"Fundamento Legal: {response.fundamento_legal}"
+            partes.append(f"\nResposta Correta: {response.resposta_correta}\n")
+            partes.append(f"Explicação: {response.explicacao_detalhada}\n")
+            partes.append(f"Fundamento Legal: {response.fundamento_legal}")
             
-            doc = Document(
-                page_content=conteudo,
-                metadata={
-                    "tipo": "resposta",
-                    "pergunta": request.pergunta,
-                    "resposta_correta": response.resposta_correta,
-                    "explicacao_detalhada": response.explicacao_detalhada,
-                    "fundamento_legal": response.fundamento_legal,
-                    "dicas_estudo": response.dicas_estudo or [],
-                    "referencias": response.referencias or []
-                }
-            )
+            metadata = {
+                "tipo": "resposta",
+                "pergunta": request.pergunta,
+                # Hexadecimal: o OpenSearch só indexa inteiros de 64 bits com sinal
+                "simhash": f"{_simhash64(normalizada):016x}",
+                "questao_sha256": self._chave_questao(request),
+                "complemento_sha256": _hash_complemento(request),
+                "resposta_correta": response.resposta_correta,
+                "explicacao_detalhada": response.explicacao_detalhada,
+                "fundamento_legal": response.fundamento_legal,
+                "dicas_estudo": response.dicas_estudo or [],
+                "referencias": response.referencias or []
+            }
+            
+            # Perguntas parecidas passam a ser respondidas direto da memória
+            vetor = await vectorstore_service.gerar_embedding(request.pergunta)
+            semantic_answer_cache.guardar(vetor, 1, [metadata])
             
-            await vectorstore_service.adicionar_documentos([doc])
+            doc = Document(page_content="".join(partes), metadata=metadata)
+            if await vectorstore_service.adicionar_documentos([doc]):
+                # Buscas em cache não refletem o novo documento
+                semantic_query_cache.limpar()
             logger.info("✅ Resposta salva no vector store")
             
         except Exception as e:
@@ -1,78 +1,164 @@
 from langchain_core.runnables import RunnablePassthrough, RunnableLambda, RunnableParallel
-from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
+from langchain_core.output_parsers import StrOutputParser
 from langchain_core.documents import Document
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+from collections import OrderedDict
+from functools import lru_cache
+import asyncio
 import logging
+import re
 
-from services.llm_service import get_llm_creative, get_llm_precise
-from services.vectorstore_service import VectorStoreService
+import orjson
+
+from services.llm_service import get_llm_creative, get_llm_precise, invocar_compartilhado
+from services.vectorstore_service import vectorstore_service
+from services.semantic_cache import grounded_answer_cache
 from prompts.templates import (
-    PromptTemplates,
+    NIVEIS_DIFICULDADE,
+    FORMATOS_QUESTAO,
+    QUESTOES_PARSER,
+    RESPOSTA_PARSER,
     get_gerar_questoes_prompt,
     get_responder_prompt
 )
 from models.schemas import (
-    DificuldadeEnum,
-    TipoQuestaoEnum,
-    QuestoesOutput,
-    RespostaOutput
+    Dificuldade,
+    TipoQuestao
 )
 
 logger = logging.getLogger(__name__)
 
+CONTEXTOS_CACHE_SIZE = 512
+
+# Sobreposição mínima (Jaccard) entre os documentos da resposta em cache e os da
+# busca atual para reaproveitá-la (evita servir resposta com evidência desatualizada)
+EVIDENCIA_MIN_JACCARD = 0.8
+
+# Números de artigos citados ("Art. 5º", "art 2") no fundamento e no contexto
+PADRAO_ARTIGO_CITADO = re.compile(r"\bart\.?\s*(\d+)", re.IGNORECASE)
+
+# Candidatos trazidos na busca geral para reordenar e ficar com os k melhores
+CANDIDATOS_RERANK = 20
+PADRAO_PALAVRA = re.compile(r"\w{3,}")
+
+# Termos do tema que identificam uma lei -> número no metadado `lei_numero`
+LEIS_POR_TERMO = {
+    "lei de introdução": "4657",
+    "lindb": "4657",
+    "4657": "4657",
+    "código civil": "10406",
+    "10406": "10406",
+    "código penal": "2848",
+    "2848": "2848"
+}
+PADRAO_LEI = re.compile("|".join(map(re.escape, sorted(LEIS_POR_TERMO, key=len, reverse=True))))
+
+# Termos comuns -> expansão da query com a lei correspondente
+EXPANSOES_POR_TERMO = {
+    "lei de introdução": "Lei 4657 LINDB",
+    "lindb": "Lei 4657 Lei de Introdução às Normas do Direito Brasileiro",
+    "4657": "Lei 4657 LINDB Lei de Introdução",
+    "código civil": "Lei 10406 Código Civil",
+    "10406": "Lei 10406 Código Civil",
+    "constituição": "Constituição Federal CF/88",
+    "cf/88": "Constituição Federal",
+    "código penal": "Decreto-Lei 2848 Código Penal",
+    "2848": "Decreto-Lei 2848 Código Penal"
+}
+PADRAO_EXPANSAO = re.compile("|".join(map(re.escape, sorted(EXPANSOES_POR_TERMO, key=len, reverse=True))))
+
+
+# Conteúdo de um bloco ```json ... ``` na resposta do LLM
+PADRAO_BLOCO_JSON = re.compile(r"```(?:json)?(.*?)```", re.DOTALL)
+
+
+def _ler_json_llm(texto: str, parser) -> Any:
+    """
+    Decodifica a resposta do LLM com orjson (texto puro ou bloco ```json).
+    JSON malformado ou truncado cai no parser leniente do LangChain.
+    """
+    bloco = PADRAO_BLOCO_JSON.search(texto)
+    try:
+        return orjson.loads(bloco.group(1) if bloco else texto)
+    except orjson.JSONDecodeError:
+        return parser.parse(texto)
+
+
+def _jaccard(a: set, b: set) -> float:
+    """Similaridade de Jaccard (dois conjuntos vazios são idênticos)"""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+@lru_cache(maxsize=1024)
+def _expandir_query(tema: str) -> str:
+    """Acrescenta ao tema as expansões dos termos encontrados (uma só varredura)"""
+    encontrados = set(PADRAO_EXPANSAO.findall(tema.lower()))
+    if not encontrados:
+        return tema
+    # Mantém a ordem do mapeamento, como na expansão original
+    return " ".join([tema, *(exp for termo, exp in EXPANSOES_POR_TERMO.items() if termo in encontrados)])
+
+
+# Chains montadas uma única vez (prompts e LLMs já são reaproveitados).
+# Saída em texto bruto: JSON inválido é registrado sem nova chamada ao LLM
+_CHAIN_QUESTOES = get_gerar_questoes_prompt() | get_llm_creative(temperature=0.7) | StrOutputParser()
+_CHAIN_RESPOSTA = get_responder_prompt() | get_llm_precise(temperature=0.2) | StrOutputParser()
+
 
 class RAGChainService:
     """Serviço que implementa as chains RAG usando LangChain"""
     
     def __init__(self):
-        self.vectorstore_service = VectorStoreService()
+        self.vectorstore_service = vectorstore_service
+        # ids dos documentos -> (contexto formatado, fontes) (LRU)
+        self._contextos_formatados: "OrderedDict[Tuple[str, ...], Tuple[str, List[str]]]" = OrderedDict()
     
-    def _formatar_documentos(self, docs: List[Document]) -> str:
-        """Formata documentos recuperados em texto para o contexto"""
+    def _contexto_e_fontes(self, docs: List[Document]) -> Tuple[str, List[str]]:
+        """
+        Formata documentos recuperados em texto para o contexto e extrai a lista
+        de fontes (sem repetições, na ordem da busca) em uma única passada.
+        """
         if not docs:
-            return "Nenhum contexto específico disponível. Use seu conhecimento geral sobre legislação brasileira."
+            return "Nenhum contexto específico disponível. Use seu conhecimento geral sobre legislação brasileira.", []
+        
+        # Mesmo conjunto de documentos (pelos ids do OpenSearch) reaproveita o resultado
+        chave = tuple(doc.id for doc in docs)
+        if all(chave):
+            em_cache = self._contextos_formatados.get(chave)
+            if em_cache is not None:
+                self._contextos_formatados.move_to_end(chave)
+                return em_cache
         
         partes = []
+        fontes = []
         for i, doc in enumerate(docs, 1):
-            titulo = doc.metadata.get('titulo', 'Documento')
-            fonte = doc.metadata.get('fonte', '')
-            tipo = doc.metadata.get('tipo', '')
-            
-            parte = f"### Documento {i}: {titulo}"
-            if fonte:
-                parte += f" (Fonte: {fonte})"
-            if tipo:
-                parte += f" [Tipo: {tipo}]"
-            parte += f"\n{doc.page_content[:2000]}"
+            get = doc.metadata.get
+            titulo = get('titulo')
+            fonte = get('fonte', '')
+            tipo = get('tipo', '')
             
-            partes.append(parte)
+            # Cabeçalho e conteúdo montados em uma única string por documento
+            partes.append(
+                f"### Documento {i}: {'Documento' if titulo is None else titulo}"
+                f"{f' (Fonte: {fonte})' if fonte else ''}"
+                f"{f' [Tipo: {tipo}]' if tipo else ''}"
+                f"\n{doc.page_content[:2000]}"
+            )
+            if titulo or fonte:
+                fontes.append(f"{titulo or ''} - {fonte}" if fonte else titulo)
         
-        return "\n\n---\n\n".join(partes)
+        resultado = ("\n\n---\n\n".join(partes), list(dict.fromkeys(fontes)))
+        if all(chave):
+            self._contextos_formatados[chave] = resultado
+            if len(self._contextos_formatados) > CONTEXTOS_CACHE_SIZE:
+                self._contextos_formatados.popitem(last=False)
+        return resultado
     
     def _expandir_query_com_metadados(self, tema: str) -> str:
         """Expande a query incluindo termos relacionados a leis específicas"""
-        # Mapeia termos comuns para leis específicas
-        mapeamento_leis = {
-            "lei de introdução": "Lei 4657 LINDB",
-            "lindb": "Lei 4657 Lei de Introdução às Normas do Direito Brasileiro",
-            "4657": "Lei 4657 LINDB Lei de Introdução",
-            "código civil": "Lei 10406 Código Civil",
-            "10406": "Lei 10406 Código Civil",
-            "constituição": "Constituição Federal CF/88",
-            "cf/88": "Constituição Federal",
-            "código penal": "Decreto-Lei 2848 Código Penal",
-            "2848": "Decreto-Lei 2848 Código Penal"
-        }
-        
-        tema_lower = tema.lower()
-        query_expandida = tema
-        
-        # Adiciona termos relacionados
-        for termo, expansao in mapeamento_leis.items():
-            if termo in tema_lower:
-                query_expandida += f" {expansao}"
-        
-        return query_expandida
+        return _expandir_query(tema)
     
     async def _buscar_contexto_inteligente(self, tema: str, k: int = 5) -> List[Document]:
         """Busca contexto considerando metadados e conteúdo"""
@@ -80,24 +166,29 @@ class RAGChainService:
             # 1. Expande query com termos relacionados
             query_expandida = self._expandir_query_com_metadados(tema)
             
-            # 2. Busca artigos em vigor primeiro
-            docs_vigor = await self.vectorstore_service.buscar_similares(
-                query_expandida, k=max(1, k//2), filtro={"em_vigor": True}
-            )
-            
-            # 3. Busca geral para complementar
-            docs_geral = await self.vectorstore_service.buscar_similares(
-                query_expandida, k=k
-            )
+            # 2. Busca artigos em vigor e 3. busca geral para complementar.
+            #    Se o tema cita uma única lei conhecida, o OpenSearch já filtra por ela
+            filtro_lei = self._detectar_filtro_lei(tema)
+            docs_vigor, docs_geral = await self._buscar_vigor_e_geral(query_expandida, k, filtro_lei or {})
+            if filtro_lei and not (docs_vigor or docs_geral):
+                # Documentos indexados antes do campo lei_numero: busca sem o filtro
+                filtro_lei = None
+                docs_vigor, docs_geral = await self._buscar_vigor_e_geral(query_expandida, k, {})
             
             # 4. Combina priorizando artigos em vigor e remove duplicatas
+            #    (pelo id do OpenSearch; o texto serve de chave se não houver id).
+            #    As vagas restantes ficam com os candidatos da busca geral mais
+            #    aderentes ao tema
             docs_combinados = docs_vigor.copy() if docs_vigor else []
-            for doc in (docs_geral or []):
-                if doc not in docs_combinados and len(docs_combinados) < k:
-                    docs_combinados.append(doc)
+            vistos = {doc.id or doc.page_content for doc in docs_combinados}
+            candidatos = [doc for doc in (docs_geral or []) if (doc.id or doc.page_content) not in vistos]
+            docs_combinados.extend(self._reordenar_por_tema(candidatos, tema)[:max(0, k - len(docs_combinados))])
             
             # 5. Filtra por relevância de metadados se possível
-            if docs_combinados:
+            #    (desnecessário se a busca já foi filtrada pela lei)
+            if docs_combinados and filtro_lei:
+                return docs_combinados[:k]
+            elif docs_combinados:
                 docs_filtrados = self._filtrar_por_metadados(docs_combinados, tema)
                 return docs_filtrados[:k]
             else:
@@ -113,6 +204,54 @@ class RAGChainService:
                 logger.error(f"Erro no fallback da busca: {fallback_error}")
                 return []
     
+    def _detectar_filtro_lei(self, tema: str) -> Optional[Dict[str, str]]:
+        """Filtro {"lei_numero": ...} quando o tema menciona exatamente uma lei conhecida"""
+        leis = {LEIS_POR_TERMO[termo] for termo in PADRAO_LEI.findall(tema.lower().replace(".", ""))}
+        return {"lei_numero": leis.pop()} if len(leis) == 1 else None
+    
+    async def _buscar_vigor_e_geral(
+        self,
+        query: str,
+        k: int,
+        filtro: Dict[str, Any]
+    ) -> Tuple[List[Document], List[Document]]:
+        """Busca artigos em vigor e a busca geral em paralelo (um só embedding da query)"""
+        docs_vigor, docs_geral = await asyncio.gather(
+            self.vectorstore_service.buscar_similares(
+                query, k=max(1, k//2), filtro={**filtro, "em_vigor": True}
+            ),
+            # Busca geral com folga de candidatos para a reordenação
+            self.vectorstore_service.buscar_similares(query, k=max(k, CANDIDATOS_RERANK), filtro=filtro),
+            return_exceptions=True
+        )
+        if isinstance(docs_vigor, Exception):
+            logger.warning(f"Erro na busca de artigos em vigor: {docs_vigor}")
+            docs_vigor = []
+        if isinstance(docs_geral, Exception):
+            logger.warning(f"Erro na busca geral: {docs_geral}")
+            docs_geral = []
+        return docs_vigor, docs_geral
+    
+    async def buscar_contexto(self, tema: str, k: int = 5) -> List[Document]:
+        """Busca o contexto usado na geração de questões"""
+        return await self._buscar_contexto_inteligente(tema, k=k)
+    
+    def _reordenar_por_tema(self, docs: List[Document], tema: str) -> List[Document]:
+        """
+        Reordena candidatos pela fração das palavras do tema presentes no início
+        do texto; empates mantêm a ordem de similaridade do OpenSearch.
+        """
+        palavras_tema = set(PADRAO_PALAVRA.findall(tema.lower()))
+        if not palavras_tema or len(docs) < 2:
+            return docs
+        
+        cobertura = [
+            len(palavras_tema.intersection(PADRAO_PALAVRA.findall(doc.page_content[:512].lower())))
+            for doc in docs
+        ]
+        ordem = sorted(range(len(docs)), key=lambda i: -cobertura[i])
+        return [docs[i] for i in ordem]
+    
     def _filtrar_por_metadados(self, docs: List[Document], tema: str) -> List[Document]:
         """Filtra documentos por relevância de metadados"""
         tema_lower = tema.lower()
@@ -145,23 +284,14 @@ class RAGChainService:
         # Retorna relevantes primeiro, depois outros
         return docs_relevantes + docs_outros
     
-    def _extrair_fontes(self, docs: List[Document]) -> List[str]:
-        """Extrai lista de fontes dos documentos"""
-        fontes = []
-        for doc in docs:
-            titulo = doc.metadata.get('titulo', '')
-            fonte = doc.metadata.get('fonte', '')
-            if titulo or fonte:
-                fontes.append(f"{titulo} - {fonte}" if fonte else titulo)
-        return fontes
-    
     async def gerar_questoes(
         self,
         tema: str,
         quantidade: int,
-        dificuldade: DificuldadeEnum,
-        tipo: TipoQuestaoEnum,
-        questoes_existentes: List[str] = None
+        dificuldade: Dificuldade,
+        tipo: TipoQuestao,
+        questoes_existentes: List[str] = None,
+        docs: Optional[List[Document]] = None
     ) -> Dict[str, Any]:
         """
         Chain RAG para geração de questões no estilo FCC.
@@ -171,46 +301,52 @@ class RAGChainService:
         2. Monta o prompt com contexto e questões existentes
         3. Gera questões via LLM
         4. Parseia resultado em JSON
+        
+        Se `docs` for informado, usa o contexto já recuperado pelo chamador.
         """
         try:
-            # 1. Busca contexto inteligente considerando metadados
-            logger.info(f"Buscando contexto para: {tema}")
-            docs = await self._buscar_contexto_inteligente(tema, k=5)
-            
-            contexto = self._formatar_documentos(docs)
-            fontes = self._extrair_fontes(docs)
+            # 1. Dispara a busca de contexto; o prompt é montado enquanto ela roda
+            tarefa_docs = None
+            if docs is None:
+                logger.info(f"Buscando contexto para: {tema}")
+                tarefa_docs = asyncio.create_task(self._buscar_contexto_inteligente(tema, k=5))
             
             # 2. Formata questões existentes
             questoes_existentes_texto = ""
             if questoes_existentes:
-                questoes_existentes_texto = "## QUESTÕES SIMILARES JÁ EXISTENTES (NÃO REPETIR):\n"
-                for i, questao in enumerate(questoes_existentes, 1):
-                    questoes_existentes_texto += f"### Questão {i}:\n{questao}\n\n"
+                questoes_existentes_texto = "## QUESTÕES SIMILARES JÁ EXISTENTES (NÃO REPETIR):\n" + "".join(
+                    f"### Questão {i}:\n{questao}\n\n"
+                    for i, questao in enumerate(questoes_existentes, 1)
+                )
             
             # 3. Prepara variáveis do prompt
-            nivel_dificuldade = PromptTemplates.NIVEIS_DIFICULDADE[dificuldade]
-            formato_questao = PromptTemplates.FORMATOS_QUESTAO[tipo]
+            nivel_dificuldade = NIVEIS_DIFICULDADE[dificuldade]
+            formato_questao = FORMATOS_QUESTAO[tipo]
             
-            # 4. Monta a chain
-            prompt = get_gerar_questoes_prompt()
-            llm = get_llm_creative(temperature=0.7)
-            parser = JsonOutputParser(pydantic_object=QuestoesOutput)
+            # 4. Chain montada na importação (ver _CHAIN_QUESTOES)
+            parser = QUESTOES_PARSER
             
-            chain = prompt | llm | parser
+            if tarefa_docs is not None:
+                docs = await tarefa_docs
+            
+            contexto, fontes = self._contexto_e_fontes(docs)
             
             # 5. Executa com tratamento de erro robusto
             logger.info("Gerando questões via LLM...")
             
+            entrada = {
+                "contexto": contexto,
+                "tema": tema,
+                "quantidade": quantidade,
+                "nivel_dificuldade": nivel_dificuldade,
+                "tipo_questao": tipo,
+                "formato_questao": formato_questao,
+                "questoes_existentes": questoes_existentes_texto
+            }
+            resultado_texto = await invocar_compartilhado(_CHAIN_QUESTOES, entrada, ("questoes", *entrada.values()))
+            
             try:
-                resultado = await chain.ainvoke({
-                    "contexto": contexto,
-                    "tema": tema,
-                    "quantidade": quantidade,
-                    "nivel_dificuldade": nivel_dificuldade,
-                    "tipo_questao": tipo.value,
-                    "formato_questao": formato_questao,
-                    "questoes_existentes": questoes_existentes_texto
-                })
+                resultado = _ler_json_llm(resultado_texto, parser)
                 
                 # Verifica se o resultado é válido
                 if isinstance(resultado, dict):
@@ -237,31 +373,12 @@ class RAGChainService:
                 
             except Exception as parse_error:
                 logger.error(f"Erro no parsing JSON: {parse_error}")
-                # Fallback: tenta sem parser JSON
-                try:
-                    chain_fallback = prompt | llm
-                    resultado_texto = await chain_fallback.ainvoke({
-                        "contexto": contexto,
-                        "tema": tema,
-                        "quantidade": quantidade,
-                        "nivel_dificuldade": nivel_dificuldade,
-                        "tipo_questao": tipo.value,
-                        "formato_questao": formato_questao,
-                        "questoes_existentes": questoes_existentes_texto
-                    })
-                    logger.warning(f"Fallback - resposta em texto: {resultado_texto[:500]}...")
-                    return {
-                        "sucesso": False,
-                        "questoes": [],
-                        "erro": f"Erro no parsing JSON: {str(parse_error)}"
-                    }
-                except Exception as fallback_error:
-                    logger.error(f"Erro no fallback: {fallback_error}")
-                    return {
-                        "sucesso": False,
-                        "questoes": [],
-                        "erro": f"Erro completo: {str(parse_error)}"
-                    }
+                logger.warning(f"Resposta em texto do LLM: {resultado_texto[:500]}...")
+                return {
+                    "sucesso": False,
+                    "questoes": [],
+                    "erro": f"Erro no parsing JSON: {str(parse_error)}"
+                }
             
             return {
                 "sucesso": True,
@@ -277,6 +394,25 @@ class RAGChainService:
                 "erro": str(e)
             }
     
+    @staticmethod
+    def _resposta_reaproveitavel(
+        em_cache: Dict[str, Any],
+        entrada_usuario: str,
+        evidencias: List[str],
+        contexto: str
+    ) -> bool:
+        """
+        Gates do cache de respostas (a similaridade da pergunta já foi verificada):
+        mesmas alternativas/contexto do usuário, documentos recuperados quase
+        os mesmos (Jaccard dos ids; ids novos a cada indexação cobrem mudanças
+        no corpus) e todos os artigos citados no fundamento presentes no contexto.
+        """
+        if em_cache["entrada"] != entrada_usuario:
+            return False
+        if _jaccard(set(em_cache["evidencias"]), set(evidencias)) < EVIDENCIA_MIN_JACCARD:
+            return False
+        return set(em_cache["artigos"]).issubset(PADRAO_ARTIGO_CITADO.findall(contexto))
+    
     async def responder_questao(
         self,
         pergunta: str,
@@ -293,11 +429,24 @@ class RAGChainService:
         4. Retorna resposta estruturada
         """
         try:
-            # 1. Recupera contexto
+            # 1. Recupera contexto (o embedding da pergunta serve também ao cache)
             logger.info("Buscando contexto para resposta...")
-            docs = await self.vectorstore_service.buscar_similares(pergunta, k=5)
-            contexto = self._formatar_documentos(docs)
-            fontes = self._extrair_fontes(docs)
+            try:
+                vetor = await self.vectorstore_service.gerar_embedding(pergunta)
+            except Exception as e:
+                logger.error(f"Erro ao gerar embedding da pergunta: {e}")
+                vetor = None
+            docs = await self.vectorstore_service.buscar_similares_por_vetor(vetor, k=5) if vetor else []
+            contexto, fontes = self._contexto_e_fontes(docs)
+            
+            # Pergunta equivalente já respondida com a mesma evidência: dispensa o LLM
+            entrada_usuario = "\x1f".join([*(alternativas or []), contexto_adicional or ""])
+            evidencias = [doc.id for doc in docs if doc.id]
+            if vetor:
+                em_cache = grounded_answer_cache.buscar(vetor, 1)
+                if em_cache and self._resposta_reaproveitavel(em_cache[0], entrada_usuario, evidencias, contexto):
+                    logger.info("✅ Resposta reaproveitada do cache semântico da chain")
+                    return {"sucesso": True, **em_cache[0]["resultado"]}
             
             # 2. Formata alternativas
             alternativas_texto = ""
@@ -309,23 +458,22 @@ class RAGChainService:
             if contexto_adicional:
                 ctx_adicional = f"## INFORMAÇÃO ADICIONAL DO USUÁRIO:\n{contexto_adicional}"
             
-            # 3. Monta a chain
-            prompt = get_responder_prompt()
-            llm = get_llm_precise(temperature=0.2)
-            parser = JsonOutputParser(pydantic_object=RespostaOutput)
-            
-            chain = prompt | llm | parser
+            # 3. Chain montada na importação (ver _CHAIN_RESPOSTA)
+            parser = RESPOSTA_PARSER
             
             # 4. Executa com tratamento de erro
             logger.info("Gerando resposta via LLM...")
             
+            entrada = {
+                "contexto": contexto,
+                "pergunta": pergunta,
+                "alternativas_texto": alternativas_texto,
+                "contexto_adicional": ctx_adicional
+            }
+            resultado_texto = await invocar_compartilhado(_CHAIN_RESPOSTA, entrada, ("resposta", *entrada.values()))
+            
             try:
-                resultado = await chain.ainvoke({
-                    "contexto": contexto,
-                    "pergunta": pergunta,
-                    "alternativas_texto": alternativas_texto,
-                    "contexto_adicional": ctx_adicional
-                })
+                resultado = _ler_json_llm(resultado_texto, parser)
                 
                 # Verifica se o resultado é válido
                 if not isinstance(resultado, dict):
@@ -341,6 +489,7 @@ class RAGChainService:
                 
             except Exception as parse_error:
                 logger.error(f"Erro no parsing JSON da resposta: {parse_error}")
+                logger.warning(f"Resposta em texto do LLM: {resultado_texto[:500]}...")
                 return {
                     "sucesso": False,
                     "resposta_correta": "",
@@ -351,9 +500,16 @@ class RAGChainService:
                 }
             
             # Adiciona fontes às referências
-            referencias = resultado.get("referencias", [])
-            referencias.extend(fontes)
-            resultado["referencias"] = list(set(referencias))
+            #    (mantém a ordem: referências do LLM e depois as da busca)
+            resultado["referencias"] = list(dict.fromkeys([*(resultado.get("referencias") or []), *fontes]))
+            
+            if vetor:
+                grounded_answer_cache.guardar(vetor, 1, [{
+                    "entrada": entrada_usuario,
+                    "evidencias": evidencias,
+                    "artigos": sorted(set(PADRAO_ARTIGO_CITADO.findall(resultado.get("fundamento_legal") or ""))),
+                    "resultado": resultado
+                }])
             
             return {
                 "sucesso": True,
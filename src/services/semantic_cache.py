@@ -0,0 +1,283 @@
+# src/services/semantic_cache.py
+"""
+Cache semântico em memória para buscas na base de conhecimento
+e para respostas já geradas.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import orjson
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Similaridade a partir da qual dois embeddings são considerados a mesma query
+LIMIAR_IDENTICO = 0.9999
+
+
+class SemanticQueryCache:
+    """
+    Cache de resultados de busca indexado pelo embedding da query.
+
+    Queries cujo embedding tem similaridade de cosseno >= limiar com uma
+    query já respondida reaproveitam o resultado, sem ir ao OpenSearch.
+    Entradas expiram após `ttl` segundos e o excesso é removido por LRU.
+    Queries com o mesmo texto normalizado são resolvidas por `buscar_texto`
+    antes mesmo de gerar o embedding.
+    Se `caminho` for informado, o cache é salvo em disco a cada
+    `salvar_a_cada` inserções (em uma thread, fora do event loop) e
+    recarregado na inicialização.
+    """
+
+    def __init__(
+        self,
+        limiar: float = 0.92,
+        ttl: float = 300.0,
+        max_itens: int = 512,
+        caminho: Optional[str] = None,
+        salvar_a_cada: int = 32
+    ):
+        self.limiar = limiar
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self.caminho = caminho
+        self.salvar_a_cada = salvar_a_cada
+        self._insercoes_pendentes = 0
+        # Gravação periódica em andamento e geração (limpar() descarta gravações antigas)
+        self._gravacao: Optional[asyncio.Future] = None
+        self._geracao = 0
+
+        # slot -> (limite, resultados, expira_em), em ordem de uso (LRU)
+        self._entradas: "OrderedDict[int, Tuple[int, Any, float]]" = OrderedDict()
+        # Embeddings normalizados, uma linha por slot
+        self._matriz: Optional[np.ndarray] = None
+        self._ativos = np.zeros(max_itens, dtype=bool)
+        # Índice exato: texto normalizado -> slot (e o inverso, para limpeza)
+        self._por_texto: Dict[str, int] = {}
+        self._textos: Dict[int, str] = {}
+
+        if self.caminho:
+            self._carregar()
+
+    @staticmethod
+    def _normalizar(vetor: List[float]) -> np.ndarray:
+        v = np.asarray(vetor, dtype=np.float32)
+        norma = np.linalg.norm(v)
+        return v / norma if norma > 0 else v
+
+    @staticmethod
+    def _normalizar_texto(texto: str) -> str:
+        return " ".join(texto.lower().split())
+
+    def _desassociar_texto(self, slot: int):
+        texto = self._textos.pop(slot, None)
+        if texto is not None:
+            self._por_texto.pop(texto, None)
+
+    def _remover(self, slot: int):
+        self._entradas.pop(slot, None)
+        self._ativos[slot] = False
+        self._desassociar_texto(slot)
+
+    def _ler_slot(self, slot: int, limite: int) -> Optional[Any]:
+        """Valida TTL e limite da entrada no slot e retorna seus resultados"""
+        limite_cache, resultados, expira_em = self._entradas[slot]
+        if expira_em < time.time():
+            self._remover(slot)
+            return None
+
+        # Resultado em cache precisa cobrir o limite pedido
+        if limite_cache < limite and len(resultados) >= limite_cache:
+            return None
+
+        self._entradas.move_to_end(slot)
+        return resultados[:limite]
+
+    def _slot_identico(self, q: np.ndarray) -> Optional[int]:
+        """Slot ativo com o mesmo embedding (a menos de arredondamento), se houver"""
+        if not self._entradas:
+            return None
+        scores = self._matriz @ q
+        scores[~self._ativos] = -np.inf
+        slot = int(scores.argmax())
+        return slot if scores[slot] >= LIMIAR_IDENTICO else None
+
+    def buscar_texto(self, texto: str, limite: int) -> Optional[Any]:
+        """Retorna o resultado em cache para o mesmo texto de query, ou None"""
+        slot = self._por_texto.get(self._normalizar_texto(texto))
+        if slot is None or slot not in self._entradas:
+            return None
+
+        resultados = self._ler_slot(slot, limite)
+        if resultados is not None:
+            logger.debug("🎯 Cache semântico: hit exato")
+        return resultados
+
+    def buscar(self, vetor: List[float], limite: int) -> Optional[Any]:
+        """Retorna o resultado em cache para uma query similar, ou None"""
+        if not self._entradas or self._matriz is None:
+            return None
+
+        q = self._normalizar(vetor)
+        if q.shape[0] != self._matriz.shape[1]:
+            return None
+
+        scores = self._matriz @ q
+        scores[~self._ativos] = -np.inf
+        slot = int(scores.argmax())
+
+        if scores[slot] < self.limiar:
+            return None
+
+        resultados = self._ler_slot(slot, limite)
+        if resultados is not None:
+            logger.debug(f"🎯 Cache semântico: hit (score={scores[slot]:.3f})")
+        return resultados
+
+    def guardar(self, vetor: List[float], limite: int, resultados: Any, texto: Optional[str] = None):
+        """Armazena o resultado de uma busca (e o texto da query, se informado)"""
+        q = self._normalizar(vetor)
+
+        if self._matriz is None or self._matriz.shape[1] != q.shape[0]:
+            self._matriz = np.zeros((self.max_itens, q.shape[0]), dtype=np.float32)
+            self._ativos[:] = False
+            self._entradas.clear()
+            self._por_texto.clear()
+            self._textos.clear()
+
+        slot = self._slot_identico(q)
+        if slot is not None:
+            # Mesma query: a nova entrada substitui a anterior (que perderia no argmax)
+            self._entradas.pop(slot, None)
+            self._desassociar_texto(slot)
+        else:
+            if len(self._entradas) >= self.max_itens:
+                slot, _ = self._entradas.popitem(last=False)
+                self._ativos[slot] = False
+                self._desassociar_texto(slot)
+            slot = int(np.flatnonzero(~self._ativos)[0])
+        self._matriz[slot] = q
+        self._ativos[slot] = True
+        self._entradas[slot] = (limite, resultados, time.time() + self.ttl)
+
+        if texto is not None:
+            chave = self._normalizar_texto(texto)
+            slot_anterior = self._por_texto.get(chave)
+            if slot_anterior is not None:
+                self._textos.pop(slot_anterior, None)
+            self._por_texto[chave] = slot
+            self._textos[slot] = chave
+
+        self._insercoes_pendentes += 1
+        if self.caminho and self._insercoes_pendentes >= self.salvar_a_cada:
+            self._salvar_em_segundo_plano()
+    
+    def _salvar_em_segundo_plano(self):
+        """Grava o snapshot em uma thread; sem event loop (ex.: scripts), grava direto"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.salvar()
+            return
+        
+        if self._gravacao is not None and not self._gravacao.done():
+            return  # Pendências entram na próxima gravação
+        self._gravacao = loop.run_in_executor(None, self._gravar, self._snapshot())
+
+    def limpar(self):
+        """Invalida todas as entradas (ex.: após indexar novos documentos)"""
+        self._entradas.clear()
+        self._ativos[:] = False
+        self._por_texto.clear()
+        self._textos.clear()
+        self._insercoes_pendentes = 0
+        self._geracao += 1
+        if self.caminho and os.path.exists(self.caminho):
+            os.remove(self.caminho)
+        logger.debug("🧹 Cache semântico invalidado")
+
+    def salvar(self):
+        """Grava o cache em disco (escrita atômica via arquivo temporário)"""
+        if not self.caminho or self._matriz is None:
+            return
+        self._gravar(self._snapshot())
+    
+    def _snapshot(self) -> Tuple[int, np.ndarray, np.ndarray, list]:
+        """Cópia do estado a gravar (no event loop; a serialização fica para _gravar)"""
+        agora = time.time()
+        entradas = [
+            [slot, limite, resultados, expira_em, self._textos.get(slot)]
+            for slot, (limite, resultados, expira_em) in self._entradas.items()
+            if expira_em >= agora
+        ]
+        self._insercoes_pendentes = 0
+        return self._geracao, self._matriz.copy(), self._ativos.copy(), entradas
+    
+    def _gravar(self, snapshot: Tuple[int, np.ndarray, np.ndarray, list]):
+        """Serializa e grava um snapshot (pode rodar fora do event loop)"""
+        geracao, matriz, ativos, entradas = snapshot
+        try:
+            # Um temporário por thread: a gravação do shutdown pode coincidir com a periódica
+            temporario = f"{self.caminho}.{threading.get_ident()}.tmp"
+            with open(temporario, "wb") as f:
+                np.savez(
+                    f,
+                    matriz=matriz,
+                    ativos=ativos,
+                    entradas=np.frombuffer(orjson.dumps(entradas), dtype=np.uint8)
+                )
+            if geracao != self._geracao:
+                # Cache invalidado durante a gravação: o snapshot já está obsoleto
+                os.remove(temporario)
+                return
+            os.replace(temporario, self.caminho)
+            logger.debug(f"💾 Cache semântico salvo ({len(entradas)} entradas)")
+        except Exception as e:
+            logger.warning(f"Erro ao salvar cache semântico: {e}")
+    
+    def _carregar(self):
+        """Recarrega o cache salvo em disco (e o índice por texto), descartando entradas expiradas"""
+        if not os.path.exists(self.caminho):
+            return
+        try:
+            with np.load(self.caminho) as dados:
+                matriz = dados["matriz"]
+                entradas = orjson.loads(dados["entradas"].tobytes())
+
+            if matriz.shape[0] != self.max_itens:
+                return
+
+            agora = time.time()
+            self._matriz = matriz.astype(np.float32, copy=False)
+            for slot, limite, resultados, expira_em, *texto in entradas:
+                if expira_em >= agora:
+                    self._entradas[slot] = (limite, resultados, expira_em)
+                    self._ativos[slot] = True
+                    # Snapshots antigos não têm o texto da query
+                    if texto and texto[0] is not None:
+                        self._por_texto[texto[0]] = slot
+                        self._textos[slot] = texto[0]
+            logger.info(f"✅ Cache semântico carregado: {len(self._entradas)} entradas")
+        except Exception as e:
+            logger.warning(f"Erro ao carregar cache semântico: {e}")
+
+
+# Singleton
+semantic_query_cache = SemanticQueryCache(
+    caminho=(settings.SEMANTIC_CACHE_PATH or None) if settings.persistir_caches else None
+)
+
+# Respostas geradas, por embedding da pergunta (só respostas, fora do índice principal)
+semantic_answer_cache = SemanticQueryCache(limiar=0.95, ttl=3600.0, max_itens=1024)
+
+# Respostas da chain RAG, por embedding da pergunta e com as fontes que as fundamentaram
+grounded_answer_cache = SemanticQueryCache(
+    limiar=settings.SEMANTIC_ANSWER_THRESHOLD, ttl=3600.0, max_itens=1024
+)
@@ -1,18 +1,87 @@
 # src/services/vectorstore_service.py
 from langchain_community.vectorstores import OpenSearchVectorSearch
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from opensearchpy import OpenSearch
-from typing import List, Optional, Dict, Any
+from opensearchpy.helpers import bulk
+from collections import OrderedDict
+from typing import List, Optional, Dict, Any, Tuple
+import asyncio
 import logging
+import os
+import random
+import threading
+import time
+import uuid
+
+import numpy as np
+import orjson
 
 from core.config import settings
-from services.llm_service import get_embeddings
+from services.llm_service import get_embeddings, assinatura_embeddings
 
 logger = logging.getLogger(__name__)
 
 # Dimensão do embedding do bge-m3
 BGE_M3_DIMENSION = 1024
 
+# Máximo de embeddings de consulta mantidos em memória
+EMBEDDING_CACHE_SIZE = 4096
+
+# Validade (segundos) da contagem de documentos e do status em cache
+ESTATISTICAS_TTL = 30.0
+
+# Conexões keep-alive mantidas com o OpenSearch
+OPENSEARCH_POOL_SIZE = 32
+
+# Tamanho máximo de cada requisição _bulk (lotes maiores são divididos)
+BULK_MAX_BYTES = 10 * 1024 * 1024
+
+# Espera base (segundos, com jitter) antes de reenviar itens rejeitados no bulk
+# (tipicamente 429: fila de escrita do OpenSearch cheia)
+BULK_RETRY_ESPERA = 1.0
+
+# Vetores são normalizados (norma L2 = 1), então produto interno == cosseno
+ESPACO_VETORIAL = "innerproduct"
+
+# Quantização escalar do Lucene: calibra os limites a partir dos próprios
+# vetores e guarda cada dimensão em 1 byte (4x menos que float32).
+# As consultas continuam em float32
+ENCODER_QUANTIZACAO = {"encoder": {"name": "sq"}} if settings.KNN_QUANTIZACAO else {}
+
+# Trunca o texto no próprio OpenSearch, sem trafegar o conteúdo completo
+SCRIPT_TRECHO = (
+    "def t = params._source.text; "
+    "if (t == null) { return ''; } "
+    "return t.length() > params.max ? t.substring(0, params.max) + '...' : t;"
+)
+
+
+class EmbeddingsNormalizados(Embeddings):
+    """Envolve um modelo de embeddings retornando vetores com norma L2 unitária"""
+    
+    def __init__(self, base: Embeddings):
+        self._base = base
+    
+    @staticmethod
+    def _normalizar(vetores: List[List[float]]) -> List[List[float]]:
+        matriz = np.asarray(vetores, dtype=np.float32)
+        normas = np.linalg.norm(matriz, axis=-1, keepdims=True)
+        normas[normas == 0] = 1.0
+        return (matriz / normas).tolist()
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._normalizar(self._base.embed_documents(texts))
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self._normalizar([self._base.embed_query(text)])[0]
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._normalizar(await self._base.aembed_documents(texts))
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        return self._normalizar([await self._base.aembed_query(text)])[0]
+
 
 class VectorStoreService:
     """Serviço para gerenciar o vector store com OpenSearch"""
@@ -21,17 +90,33 @@ class VectorStoreService:
     _vectorstore: Optional[OpenSearchVectorSearch] = None
     _client: Optional[OpenSearch] = None
     _initialized: bool = False
+    # Serializa a criação e a inicialização da instância única entre threads
+    _lock = threading.Lock()
     
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super().__new__(cls)
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
         return cls._instance
     
     def __init__(self):
-        if not self._initialized:
-            self._embeddings = get_embeddings()
+        if self._initialized:
+            return
+        with self._lock:
+            if self._initialized:
+                return
+            self._embeddings = EmbeddingsNormalizados(get_embeddings())
             self._index_name = settings.OPENSEARCH_INDEX
+            self._space_type = ESPACO_VETORIAL
+            # float32 (4 KB por vetor): os embeddings já chegam normalizados em float32
+            self._cache_embeddings: OrderedDict[str, np.ndarray] = OrderedDict()
+            # Embeddings em cálculo, compartilhados por buscas simultâneas do mesmo texto
+            self._embeddings_pendentes: Dict[str, asyncio.Task] = {}
+            self._contagem_cache: Optional[Tuple[float, int]] = None
+            self._conexao_cache: Optional[Tuple[float, bool]] = None
             self._initialize_client()
+            self._carregar_cache_embeddings()
             self._initialized = True
     
     def _initialize_client(self):
@@ -46,7 +131,11 @@ class VectorStoreService:
                 use_ssl=settings.OPENSEARCH_USE_SSL,
                 verify_certs=False,
                 ssl_show_warn=False,
-                timeout=30
+                timeout=30,
+                # Consultas rodam em asyncio.to_thread (até 32 threads no executor
+                # padrão): com o pool padrão de 10, o excedente abriria e
+                # descartaria conexões a cada requisição
+                pool_maxsize=OPENSEARCH_POOL_SIZE
             )
             
             self._vectorstore = OpenSearchVectorSearch(
@@ -72,20 +161,45 @@ class VectorStoreService:
     async def verificar_conexao(self) -> bool:
         """Verifica conexão com OpenSearch"""
         try:
-            return self._client.ping()
+            return await asyncio.to_thread(self._client.ping)
         except Exception as e:
             logger.error(f"Erro ao verificar conexão: {e}")
             return False
     
+    async def verificar_conexao_cache(self) -> bool:
+        """
+        Status da conexão, reaproveitando o último ping bem-sucedido por
+        ESTATISTICAS_TTL segundos (falhas não ficam em cache)
+        """
+        agora = time.monotonic()
+        if self._conexao_cache and agora - self._conexao_cache[0] < ESTATISTICAS_TTL:
+            return self._conexao_cache[1]
+        
+        conectado = await self.verificar_conexao()
+        # Após uma instabilidade, a próxima consulta já verifica de novo
+        self._conexao_cache = (agora, True) if conectado else None
+        return conectado
+    
     async def criar_indice(self) -> bool:
         """
         Cria o índice com configurações para KNN.
         
         Usa 'lucene' engine (compatível com OpenSearch 2.x e 3.x)
         """
+        # Chamadas síncronas do opensearch-py fora do event loop
+        return await asyncio.to_thread(self._criar_indice)
+    
+    def _criar_indice(self) -> bool:
         try:
             if self._client.indices.exists(index=self._index_name):
-                logger.info(f"📦 Índice '{self._index_name}' já existe")
+                self._space_type = self._ler_space_type()
+                logger.info(f"📦 Índice '{self._index_name}' já existe (space_type={self._space_type})")
+                if self._space_type != ESPACO_VETORIAL:
+                    # Mudança de space_type exige reindexar: scores seguem convertidos até lá
+                    logger.warning(
+                        f"⚠️ Índice criado com space_type={self._space_type}; "
+                        f"use recriar_indice() e reindexe os documentos para usar {ESPACO_VETORIAL}"
+                    )
                 return True
             
             # Configuração compatível com OpenSearch 2.x e 3.x
@@ -105,11 +219,12 @@ class VectorStoreService:
                             "dimension": BGE_M3_DIMENSION,  # 1024 para bge-m3
                             "method": {
                                 "name": "hnsw",
-                                "space_type": "cosinesimil",
+                                "space_type": ESPACO_VETORIAL,
                                 "engine": "lucene",  # ✅ Compatível com OpenSearch 3.x
                                 "parameters": {
-                                    "ef_construction": 128,
-                                    "m": 16
+                                    "ef_construction": settings.KNN_EF_CONSTRUCTION,
+                                    "m": settings.KNN_M,
+                                    **ENCODER_QUANTIZACAO
                                 }
                             }
                         },
@@ -129,19 +244,56 @@ class VectorStoreService:
                 index=self._index_name,
                 body=index_body
             )
-            logger.info(f"✅ Índice '{self._index_name}' criado (engine=lucene, dim={BGE_M3_DIMENSION})")
+            self._space_type = ESPACO_VETORIAL
+            logger.info(
+                f"✅ Índice '{self._index_name}' criado "
+                f"(engine=lucene, dim={BGE_M3_DIMENSION}, sq={settings.KNN_QUANTIZACAO})"
+            )
             return True
             
         except Exception as e:
             logger.error(f"❌ Erro ao criar índice: {e}")
             return False
     
+    def _ler_space_type(self) -> str:
+        """Lê o space_type do campo vetorial de um índice existente"""
+        try:
+            mapping = self._client.indices.get_mapping(index=self._index_name)
+            campo = mapping[self._index_name]["mappings"]["properties"]["vector_field"]
+            return campo.get("method", {}).get("space_type", ESPACO_VETORIAL)
+        except Exception as e:
+            logger.warning(f"⚠️ Não foi possível ler o mapping do índice: {e}")
+            return ESPACO_VETORIAL
+    
+    def _score_cosseno(self, score: float) -> float:
+        """
+        Converte o score do OpenSearch para a escala do cosinesimil ((1 + cos) / 2).
+        
+        Mantém o significado de RAG_SCORE_THRESHOLD independente do space_type.
+        """
+        if self._space_type != "innerproduct":
+            return score
+        # Lucene innerproduct: dot + 1 se dot >= 0, senão 1 / (1 - dot)
+        cos = score - 1 if score >= 1 else 1 - 1 / score
+        return (1 + cos) / 2
+    
+    def _score_minimo(self, limiar: float) -> float:
+        """Inverso de _score_cosseno: score bruto do OpenSearch equivalente ao limiar"""
+        if self._space_type != "innerproduct":
+            return limiar
+        cos = 2 * limiar - 1
+        return cos + 1 if cos >= 0 else 1 / (1 - cos)
+    
     async def deletar_indice(self) -> bool:
         """Deleta o índice (útil para recriar com novas configs)"""
+        return await asyncio.to_thread(self._deletar_indice)
+    
+    def _deletar_indice(self) -> bool:
         try:
             if self._client.indices.exists(index=self._index_name):
                 self._client.indices.delete(index=self._index_name)
                 logger.info(f"🗑️ Índice '{self._index_name}' deletado")
+            self._contagem_cache = None
             return True
         except Exception as e:
             logger.error(f"❌ Erro ao deletar índice: {e}")
@@ -153,7 +305,86 @@ class VectorStoreService:
         return await self.criar_indice()
     
     async def adicionar_documentos(self, documentos: List[Document]) -> List[str]:
-        """Adiciona documentos ao vector store um por vez para evitar problemas de contexto"""
+        """
+        Adiciona documentos ao vector store.
+        
+        Gera os embeddings do lote em uma única chamada e insere via bulk.
+        Se os embeddings do lote falharem, reprocessa um documento por vez
+        para isolar o erro.
+        """
+        if not documentos:
+            return []
+        
+        textos = [doc.page_content for doc in documentos]
+        metadados = [doc.metadata for doc in documentos]
+        
+        try:
+            # O OllamaEmbeddings envia todos os textos em um único /api/embed
+            vetores = await self._embeddings.aembed_documents(textos)
+        except Exception as e:
+            logger.warning(f"⚠️ Falha nos embeddings do lote de {len(documentos)} documentos ({e}), processando individualmente")
+            return await self._adicionar_individualmente(documentos)
+        
+        try:
+            ids = await asyncio.to_thread(self._indexar_em_lote, textos, vetores, metadados)
+            logger.info(f"✅ Adicionados {len(ids)} documentos em lote")
+            return ids
+        except Exception as e:
+            # Erro de conexão: parte do lote pode já ter sido gravada, então não há reenvio
+            logger.error(f"❌ Erro ao indexar lote de {len(documentos)} documentos: {e}")
+            return []
+        finally:
+            self._contagem_cache = None
+    
+    def _indexar_em_lote(
+        self,
+        textos: List[str],
+        vetores: List[List[float]],
+        metadados: List[dict]
+    ) -> List[str]:
+        """
+        Insere textos com embeddings já calculados em uma requisição _bulk.
+        
+        Sem o `indices.get` e o `refresh` forçado que o add_embeddings do
+        LangChain faz a cada chamada: os documentos ficam visíveis no próximo
+        refresh periódico do índice (1 s por padrão).
+        Itens rejeitados são reenviados uma vez com o mesmo `_id` (sem duplicar
+        os que já foram gravados); retorna só os ids efetivamente indexados.
+        """
+        acoes = {
+            _id: {
+                "_op_type": "index",
+                "_index": self._index_name,
+                "_id": _id,
+                "vector_field": vetor,
+                "text": texto,
+                "metadata": metadata
+            }
+            for _id, texto, vetor, metadata in zip(
+                (str(uuid.uuid4()) for _ in textos), textos, vetores, metadados
+            )
+        }
+        
+        _, erros = bulk(self._client, acoes.values(), max_chunk_bytes=BULK_MAX_BYTES, raise_on_error=False)
+        falhas = [item["index"].get("_id") for item in erros if "index" in item]
+        if falhas:
+            logger.warning(f"⚠️ {len(falhas)} documentos rejeitados no bulk, reenviando")
+            # Roda em thread (asyncio.to_thread): dá tempo para a fila esvaziar
+            time.sleep(BULK_RETRY_ESPERA * (1 + random.random()))
+            _, erros = bulk(
+                self._client,
+                [acoes[_id] for _id in falhas if _id in acoes],
+                max_chunk_bytes=BULK_MAX_BYTES,
+                raise_on_error=False
+            )
+            for item in erros:
+                logger.error(f"❌ Documento rejeitado pelo OpenSearch: {item.get('index', {}).get('error')}")
+        
+        rejeitados = {item.get("index", {}).get("_id") for item in erros}
+        return [_id for _id in acoes if _id not in rejeitados]
+    
+    async def _adicionar_individualmente(self, documentos: List[Document]) -> List[str]:
+        """Adiciona documentos um por vez, isolando os que falham nos embeddings"""
         try:
             all_ids = []
             total = len(documentos)
@@ -162,7 +393,10 @@ class VectorStoreService:
             
             for i, doc in enumerate(documentos, 1):
                 try:
-                    ids = self._vectorstore.add_documents([doc])
+                    vetores = await self._embeddings.aembed_documents([doc.page_content])
+                    ids = await asyncio.to_thread(
+                        self._indexar_em_lote, [doc.page_content], vetores, [doc.metadata]
+                    )
                     all_ids.extend(ids)
                     
                     if i % 50 == 0:  # Log a cada 50 documentos
@@ -173,6 +407,7 @@ class VectorStoreService:
                     continue
             
             logger.info(f"✅ Adicionados {len(all_ids)} de {total} documentos")
+            self._contagem_cache = None
             return all_ids
             
         except Exception as e:
@@ -208,6 +443,96 @@ class VectorStoreService:
             logger.error(f"❌ Erro ao adicionar documento: {e}")
             return None
     
+    async def gerar_embedding(self, texto: str) -> List[float]:
+        """
+        Gera o embedding de um texto de consulta (cache LRU por texto exato).
+        
+        Chamadas simultâneas para o mesmo texto aguardam um único cálculo.
+        """
+        vetor = self._cache_embeddings.get(texto)
+        if vetor is not None:
+            self._cache_embeddings.move_to_end(texto)
+            return vetor.tolist()
+        
+        tarefa = self._embeddings_pendentes.get(texto)
+        if tarefa is None or tarefa.done():
+            tarefa = asyncio.ensure_future(self._calcular_embedding(texto))
+            self._embeddings_pendentes[texto] = tarefa
+            # Sai do mapa ao terminar (inclusive com erro ou cancelamento), mesmo
+            # que quem a criou tenha sido cancelado antes
+            tarefa.add_done_callback(lambda t: self._descartar_pendente(texto, t))
+        
+        return list(await asyncio.shield(tarefa))
+    
+    async def _calcular_embedding(self, texto: str) -> List[float]:
+        """Calcula o embedding e o guarda no cache LRU"""
+        vetor = await self._embeddings.aembed_query(texto)
+        self._cache_embeddings[texto] = np.asarray(vetor, dtype=np.float32)
+        if len(self._cache_embeddings) > EMBEDDING_CACHE_SIZE:
+            self._cache_embeddings.popitem(last=False)
+        return vetor
+    
+    def _descartar_pendente(self, texto: str, tarefa: asyncio.Task):
+        """Remove a tarefa concluída do mapa de embeddings em cálculo"""
+        if self._embeddings_pendentes.get(texto) is tarefa:
+            del self._embeddings_pendentes[texto]
+        # Marca o erro como tratado: quem aguardava já o recebeu (ou foi cancelado)
+        if not tarefa.cancelled():
+            tarefa.exception()
+    
+    def salvar_cache_embeddings(self):
+        """Grava os embeddings de consulta em disco (escrita atômica via arquivo temporário)"""
+        caminho = settings.EMBEDDING_CACHE_PATH if settings.persistir_caches else ""
+        if not caminho or not self._cache_embeddings:
+            return
+        try:
+            temporario = f"{caminho}.tmp"
+            with open(temporario, "wb") as f:
+                np.savez(
+                    f,
+                    vetores=np.stack(list(self._cache_embeddings.values())),
+                    textos=np.frombuffer(orjson.dumps(list(self._cache_embeddings)), dtype=np.uint8),
+                    modelo=np.frombuffer(assinatura_embeddings().encode(), dtype=np.uint8)
+                )
+            os.replace(temporario, caminho)
+            logger.debug(f"💾 Cache de embeddings salvo ({len(self._cache_embeddings)} entradas)")
+        except Exception as e:
+            logger.warning(f"Erro ao salvar cache de embeddings: {e}")
+    
+    def _carregar_cache_embeddings(self):
+        """
+        Recarrega os embeddings de consulta salvos (na ordem LRU em que foram gravados).
+        
+        Snapshots de outro backend/modelo de embeddings são ignorados.
+        """
+        caminho = settings.EMBEDDING_CACHE_PATH if settings.persistir_caches else ""
+        if not caminho or not os.path.exists(caminho):
+            return
+        try:
+            with np.load(caminho) as dados:
+                modelo = dados["modelo"].tobytes().decode() if "modelo" in dados.files else None
+                if modelo != assinatura_embeddings():
+                    logger.info(f"🔄 Cache de embeddings ignorado: gerado por {modelo or 'modelo desconhecido'}")
+                    return
+                vetores = dados["vetores"].astype(np.float32, copy=False)
+                textos = orjson.loads(dados["textos"].tobytes())
+            
+            for texto, vetor in zip(textos[-EMBEDDING_CACHE_SIZE:], vetores[-EMBEDDING_CACHE_SIZE:]):
+                self._cache_embeddings[texto] = vetor
+            logger.info(f"✅ Cache de embeddings carregado: {len(self._cache_embeddings)} entradas")
+        except Exception as e:
+            logger.warning(f"Erro ao carregar cache de embeddings: {e}")
+    
+    async def aquecer(self) -> bool:
+        """Carrega o modelo de embeddings no Ollama antes da primeira requisição"""
+        try:
+            await self._embeddings.aembed_query("aquecimento")
+            logger.info("✅ Modelo de embeddings carregado")
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Falha ao aquecer embeddings: {e}")
+            return False
+    
     async def buscar_similares(
         self,
         query: str,
@@ -215,43 +540,27 @@ class VectorStoreService:
         filtro: Dict[str, Any] = None
     ) -> List[Document]:
         """Busca documentos similares à query"""
+        try:
+            vetor = await self.gerar_embedding(query)
+        except Exception as e:
+            logger.error(f"❌ Erro ao gerar embedding da busca: {e}")
+            return []
+        
+        return await self.buscar_similares_por_vetor(vetor, k=k, filtro=filtro)
+    
+    async def buscar_similares_por_vetor(
+        self,
+        vetor: List[float],
+        k: int = None,
+        filtro: Dict[str, Any] = None
+    ) -> List[Document]:
+        """Busca documentos similares a um embedding já calculado"""
         try:
             k = k or settings.RAG_TOP_K
             
-            if filtro:
-                # Busca mais documentos para filtrar depois
-                docs_with_scores = self._vectorstore.similarity_search_with_score(
-                    query=query,
-                    k=k * 2
-                )
-                
-                documentos_filtrados = []
-                for doc, score in docs_with_scores:
-                    if score >= settings.RAG_SCORE_THRESHOLD:
-                        # Verifica se atende aos filtros
-                        atende_filtro = True
-                        for chave, valor in filtro.items():
-                            if doc.metadata.get(chave) != valor:
-                                atende_filtro = False
-                                break
-                        
-                        if atende_filtro:
-                            documentos_filtrados.append(doc)
-                        
-                        if len(documentos_filtrados) >= k:
-                            break
-                
-                documentos = documentos_filtrados
-            else:
-                docs_with_scores = self._vectorstore.similarity_search_with_score(
-                    query=query,
-                    k=k
-                )
-                
-                documentos = [
-                    doc for doc, score in docs_with_scores
-                    if score >= settings.RAG_SCORE_THRESHOLD
-                ]
+            documentos = [
+                doc for doc, _ in await self._buscar_knn(vetor, k, filtro, settings.RAG_SCORE_THRESHOLD)
+            ]
             
             logger.info(f"🔍 Encontrados {len(documentos)} documentos")
             return documentos
@@ -260,6 +569,121 @@ class VectorStoreService:
             logger.error(f"❌ Erro na busca: {e}")
             return []
     
+    async def _buscar_knn(
+        self,
+        vetor: List[float],
+        k: int,
+        filtro: Optional[Dict[str, Any]] = None,
+        limiar: Optional[float] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        Consulta k-NN direta no OpenSearch; retorna (documento, score de cosseno).
+        
+        O vetor armazenado não volta na resposta (1024 floats por hit a menos
+        para trafegar e decodificar). O filtro vai junto da consulta k-NN
+        (filtragem eficiente do lucene): só voltam documentos que o atendem.
+        Com `limiar` (escala de _score_cosseno), hits abaixo dele são
+        descartados pelo próprio OpenSearch (min_score).
+        """
+        consulta = self._consulta_knn(vetor, k)
+        if filtro:
+            consulta["filter"] = self._filtro_opensearch(filtro)
+        body = {
+            "size": k,
+            "_source": {"excludes": ["vector_field"]},
+            "query": {"knn": {"vector_field": consulta}}
+        }
+        if limiar is not None:
+            body["min_score"] = self._score_minimo(limiar)
+        response = await asyncio.to_thread(self._client.search, index=self._index_name, body=body)
+        
+        resultados = []
+        for hit in response["hits"]["hits"]:
+            fonte = hit.get("_source", {})
+            doc = Document(page_content=fonte.get("text", ""), metadata=fonte.get("metadata", {}), id=hit["_id"])
+            resultados.append((doc, self._score_cosseno(hit["_score"])))
+        return resultados
+    
+    @staticmethod
+    def _consulta_knn(vetor: List[float], k: int) -> Dict[str, Any]:
+        """Consulta k-NN do campo vetorial com ef_search por consulta (lucene, OpenSearch 2.16+)"""
+        return {
+            "vector": vetor,
+            "k": k,
+            "method_parameters": {"ef_search": max(settings.KNN_EF_SEARCH, k)}
+        }
+    
+    @staticmethod
+    def _filtro_opensearch(filtro: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Converte {campo: valor} em filtro bool de termos exatos sobre os metadados.
+        
+        Strings usam o subcampo .keyword do mapeamento dinâmico.
+        """
+        termos = [
+            {"term": {f"metadata.{chave}.keyword" if isinstance(valor, str) else f"metadata.{chave}": valor}}
+            for chave, valor in filtro.items()
+        ]
+        return {"bool": {"filter": termos}}
+    
+    async def buscar_trechos(
+        self,
+        vetor: List[float],
+        k: int = None,
+        max_chars: int = 500
+    ) -> List[Dict[str, str]]:
+        """
+        Busca documentos similares retornando apenas metadados e um trecho.
+        
+        O texto é truncado no servidor e nem o conteúdo completo nem o
+        vetor trafegam na resposta.
+        """
+        try:
+            k = k or settings.RAG_TOP_K
+            body = {
+                "size": k,
+                "_source": {"includes": ["metadata.titulo", "metadata.tipo", "metadata.fonte"]},
+                "script_fields": {
+                    "trecho": {
+                        "script": {"source": SCRIPT_TRECHO, "params": {"max": max_chars}}
+                    }
+                },
+                "query": {"knn": {"vector_field": self._consulta_knn(vetor, k)}},
+                "min_score": self._score_minimo(settings.RAG_SCORE_THRESHOLD)
+            }
+            response = await asyncio.to_thread(self._client.search, index=self._index_name, body=body)
+            
+            resultados = []
+            for hit in response["hits"]["hits"]:
+                metadata = hit.get("_source", {}).get("metadata", {})
+                resultados.append({
+                    "titulo": metadata.get("titulo", ""),
+                    "tipo": metadata.get("tipo", ""),
+                    "fonte": metadata.get("fonte", ""),
+                    "trecho": hit.get("fields", {}).get("trecho", [""])[0]
+                })
+            
+            logger.info(f"🔍 Encontrados {len(resultados)} documentos")
+            return resultados
+            
+        except Exception as e:
+            logger.error(f"❌ Erro na busca: {e}")
+            return []
+    
+    async def buscar_por_metadados(self, filtro: Dict[str, Any], k: int = 1) -> List[Dict[str, Any]]:
+        """Busca exata (sem embedding) pelos metadados; retorna os metadados encontrados"""
+        try:
+            body = {
+                "size": k,
+                "_source": {"includes": ["metadata"]},
+                "query": self._filtro_opensearch(filtro)
+            }
+            response = await asyncio.to_thread(self._client.search, index=self._index_name, body=body)
+            return [hit.get("_source", {}).get("metadata", {}) for hit in response["hits"]["hits"]]
+        except Exception as e:
+            logger.error(f"❌ Erro na busca por metadados: {e}")
+            return []
+    
     async def buscar_similares_com_score(
         self,
         query: str,
@@ -268,7 +692,8 @@ class VectorStoreService:
         """Busca documentos com seus scores"""
         try:
             k = k or settings.RAG_TOP_K
-            return self._vectorstore.similarity_search_with_score(query, k=k)
+            vetor = await self.gerar_embedding(query)
+            return await self._buscar_knn(vetor, k)
         except Exception as e:
             logger.error(f"❌ Erro na busca: {e}")
             return []
@@ -289,10 +714,20 @@ class VectorStoreService:
     async def contar_documentos(self) -> int:
         """Conta total de documentos no índice"""
         try:
-            result = self._client.count(index=self._index_name)
+            result = await asyncio.to_thread(self._client.count, index=self._index_name)
             return result.get('count', 0)
         except:
             return 0
+    
+    async def contar_documentos_cache(self) -> int:
+        """Contagem de documentos, reaproveitada por ESTATISTICAS_TTL segundos ou até nova indexação"""
+        agora = time.monotonic()
+        if self._contagem_cache and agora - self._contagem_cache[0] < ESTATISTICAS_TTL:
+            return self._contagem_cache[1]
+        
+        total = await self.contar_documentos()
+        self._contagem_cache = (agora, total)
+        return total
 
 
 # Singleton
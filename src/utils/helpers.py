@@ -2,13 +2,21 @@ from langchain_core.documents import Document
 from typing import List
 import re
 
+# Padrões de resposta em ordem de prioridade ("A)", "Letra A", "Resposta: A", "A")
+PADROES_RESPOSTA = tuple(re.compile(padrao) for padrao in (
+    r'\b([A-E])\)',
+    r'\b[Ll]etra\s+([A-E])\b',
+    r'\b[Rr]esposta[:\s]+([A-E])\b',
+    r'\b([A-E])\b'
+))
+
 
 def limpar_texto(texto: str) -> str:
     """Remove caracteres especiais e normaliza espaços"""
     if not texto:
         return ""
-    texto = re.sub(r'\s+', ' ', texto)
-    return texto.strip()
+    # split() sem argumentos separa pelos mesmos espaços Unicode que \s
+    return " ".join(texto.split())
 
 
 def truncar_texto(texto: str, max_chars: int = 1000) -> str:
@@ -42,15 +50,8 @@ def documentos_para_texto(docs: List[Document], max_por_doc: int = 1500) -> str:
 def extrair_letra_resposta(texto: str) -> str:
     """Extrai letra de resposta de um texto"""
     # Procura padrões como "A)", "a)", "Letra A", etc
-    padroes = [
-        r'\b([A-E])\)',
-        r'\b[Ll]etra\s+([A-E])\b',
-        r'\b[Rr]esposta[:\s]+([A-E])\b',
-        r'\b([A-E])\b'
-    ]
-    
-    for padrao in padroes:
-        match = re.search(padrao, texto)
+    for padrao in PADROES_RESPOSTA:
+        match = padrao.search(texto)
         if match:
             return match.group(1).upper()
     